@@ -16,7 +16,17 @@ You should have received a copy of the GNU Affero General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
+import sys
 from setuptools import setup, find_packages
+from setuptools.command.build_py import build_py
+
+class BuildPy(build_py):
+	def find_package_modules(self, package, package_dir):
+		modules = build_py.find_package_modules(self, package, package_dir)
+		if sys.version_info < (3, 5):
+			# The asynchronous API uses syntax that older versions can't compile
+			modules = [module for module in modules if module[:2] != ('tweetpony', 'aio')]
+		return modules
 
 metadata = {}
 with open('tweetpony/metadata.py') as f:
@@ -34,4 +44,5 @@ setup(
 	keywords = metadata['keywords'],
 	packages = find_packages(),
 	use_2to3 = True,
+	cmdclass = {'build_py': BuildPy},
 )
\ No newline at end of file
@@ -0,0 +1,46 @@
+# Copyright 2013-2015 Julian Metzler
+
+"""
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+# Measures the time an endpoint call takes without the request itself. To compare with another version,
+# pass the path of its checkout, e.g. one made with "git worktree add /tmp/tweetpony-old <commit>".
+
+import os
+import sys
+import timeit
+
+CALLS = 100000
+
+def main():
+	if len(sys.argv) > 1:
+		path = os.path.abspath(sys.argv[1])
+	else:
+		path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+	sys.path.insert(0, path)
+	import tweetpony
+	print "TweetPony from %s" % os.path.dirname(tweetpony.__file__)
+	api = tweetpony.API("ck", "cs", load_user = False)
+	api.do_request = lambda *args, **kwargs: {}
+	calls = (
+		("user_timeline(screen_name, count, include_rts)", lambda: api.user_timeline(screen_name = "Mobiru_Kinsei", count = 200, include_rts = True)),
+		("get_status(12345, trim_user = True)", lambda: api.get_status(12345, trim_user = True)),
+	)
+	for name, call in calls:
+		seconds = min(timeit.repeat(call, number = CALLS, repeat = 3))
+		print "%s: %.1f us per call" % (name, seconds / CALLS * 1e6)
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,91 @@
+# Copyright 2013-2015 Julian Metzler
+
+"""
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+# Compares the memory taken by dict-based, lazy and compact statuses, measured as the growth of the resident set
+# size while keeping a number of them (a third with a retweeted status). Every mode runs in its own process.
+# Needs Linux for /proc. Usage: bench_models_memory.py [number of statuses]
+
+import copy
+import gc
+import json
+import os
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tweetpony.models import ModelOptions, Status
+
+STATUSES = 100000
+MODES = {
+	'dict': ModelOptions(),
+	'lazy': ModelOptions(lazy = True),
+	'compact': ModelOptions(compact = True),
+}
+
+USER = {'id': 12, 'id_str': "12", 'name': "Jack", 'screen_name': "jack", 'location': "CA", 'description': "no state is the best state &amp;",
+	'url': None, 'entities': {'description': {'urls': []}}, 'protected': False, 'followers_count': 4000000, 'friends_count': 2000,
+	'listed_count': 30000, 'created_at': "Tue Mar 21 20:50:14 +0000 2006", 'favourites_count': 20000, 'utc_offset': None, 'time_zone': None,
+	'geo_enabled': True, 'verified': True, 'statuses_count': 25000, 'lang': "en", 'contributors_enabled': False, 'is_translator': False,
+	'profile_background_color': "EBEBEB", 'profile_image_url': "http://pbs.twimg.com/profile_images/1.jpeg", 'profile_link_color': "990000",
+	'profile_sidebar_border_color': "DFDFDF", 'profile_text_color': "333333", 'profile_use_background_image': True, 'default_profile': False,
+	'default_profile_image': False, 'following': None, 'follow_request_sent': None, 'notifications': None}
+
+STATUS = {'created_at': "Wed Aug 27 13:08:45 +0000 2008", 'id': 898498493, 'id_str': "898498493", 'text': "just setting up my twttr &lt;3 @biz #hello",
+	'source': "<a href=\"http://twitter.com\" rel=\"nofollow\">Twitter Web Client</a>", 'truncated': False, 'in_reply_to_status_id': None,
+	'in_reply_to_status_id_str': None, 'in_reply_to_user_id': None, 'in_reply_to_user_id_str': None, 'in_reply_to_screen_name': None,
+	'user': USER, 'geo': None, 'coordinates': None, 'place': None, 'contributors': None, 'retweet_count': 10, 'favorite_count': 5,
+	'entities': {'hashtags': [{'text': "hello", 'indices': [35, 41]}], 'symbols': [], 'urls': [], 'user_mentions': [{'screen_name': "biz", 'name': "Biz", 'id': 13, 'id_str': "13", 'indices': [29, 33]}]},
+	'favorited': False, 'retweeted': False, 'filter_level': "low", 'lang': "en"}
+
+def make_status(i, retweet = True):
+	data = copy.deepcopy(STATUS)
+	data['id'] = i
+	data['id_str'] = str(i)
+	data['user']['id'] = i % 1000
+	if retweet and i % 3 == 0:
+		data['retweeted_status'] = make_status(i + 1, retweet = False)
+	return data
+
+def get_rss():
+	with open("/proc/self/statm") as f:
+		return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+def measure(mode, count):
+	# Returns the number of bytes per status
+	options = MODES[mode]
+	lines = [json.dumps(make_status(i)) for i in range(1000)]
+	gc.collect()
+	before = get_rss()
+	statuses = []
+	for i in xrange(count):
+		statuses.append(Status.from_json(json.loads(lines[i % 1000]), options))
+	gc.collect()
+	return float(get_rss() - before) / count
+
+def main():
+	count = int(sys.argv[1]) if len(sys.argv) > 1 else STATUSES
+	for mode in ('dict', 'lazy', 'compact'):
+		output = subprocess.check_output([sys.executable, os.path.abspath(__file__), "--measure", mode, str(count)])
+		size = float(output)
+		print "%s: %.1f KB per status, %.1f GB per 1M statuses" % (mode, size / 1024, size * 1e6 / 2 ** 30)
+
+if __name__ == '__main__':
+	if sys.argv[1:2] == ["--measure"]:
+		print measure(sys.argv[2], int(sys.argv[3]))
+	else:
+		main()
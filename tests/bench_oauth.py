@@ -0,0 +1,37 @@
+# Copyright 2013-2015 Julian Metzler
+
+"""
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+# Compares the time it takes to sign a typical request with OAuthSigner and with the reference implementation
+
+import timeit
+
+from test_oauth import FixedAPI, ReferenceAPI
+
+REQUESTS = 20000
+ARGS = ("GET", "https://api.twitter.com/1.1/statuses/user_timeline.json", None, {'screen_name': "Mobiru_Kinsei", 'count': "200", 'max_id': "123456789012345678", 'include_rts': "true"})
+
+def main():
+	results = {}
+	for name, cls in (("reference", ReferenceAPI), ("OAuthSigner", FixedAPI)):
+		api = cls("ck", "cs", "at", "ats", load_user = False)
+		seconds = min(timeit.repeat(lambda: api.get_oauth_header(*ARGS), number = REQUESTS, repeat = 3))
+		results[name] = seconds
+		print "%s: %.1f us per header, %.0f headers per second" % (name, seconds / REQUESTS * 1e6, REQUESTS / seconds)
+	print "%.1fx faster" % (results["reference"] / results["OAuthSigner"])
+
+if __name__ == '__main__':
+	main()
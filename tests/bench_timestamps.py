@@ -0,0 +1,75 @@
+# Copyright 2013-2015 Julian Metzler
+
+"""
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+# Compares parsing created_at timestamps with parse_timestamp and with the strptime function TweetPony used before
+
+import locale
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tweetpony import models
+from tweetpony.models import parse_timestamp
+
+TIMESTAMPS = 20000
+# Messages per second of a busy stream, which share their timestamp
+STREAM_RATE = 50
+
+def reference_strptime(string, fmt = '%a %b %d %H:%M:%S +0000 %Y'):
+	locale.setlocale(locale.LC_TIME, 'C')
+	value = datetime.strptime(string, fmt)
+	locale.setlocale(locale.LC_TIME, '')
+	return value
+
+def make_timestamps(count, repeat = 1):
+	rand = random.Random(8)
+	start = rand.randint(1200000000, 1400000000)
+	timestamps = []
+	for i in range(count // repeat):
+		timestamps.extend([time.strftime("%a %b %d %H:%M:%S +0000 %Y", time.gmtime(start + i))] * repeat)
+	return timestamps
+
+def measure(function, timestamps, clear_cache = False):
+	best = None
+	for i in range(3):
+		if clear_cache:
+			models._timestamp_cache.clear()
+		start = time.time()
+		for timestamp in timestamps:
+			function(timestamp)
+		seconds = time.time() - start
+		best = seconds if best is None else min(best, seconds)
+	return best / len(timestamps) * 1e6
+
+def main():
+	unique = make_timestamps(TIMESTAMPS)
+	stream = make_timestamps(TIMESTAMPS, repeat = STREAM_RATE)
+	for timestamp in unique[:1000]:
+		assert parse_timestamp(timestamp) == reference_strptime(timestamp), timestamp
+	reference = measure(reference_strptime, unique)
+	unique_time = measure(parse_timestamp, unique, clear_cache = True)
+	stream_time = measure(parse_timestamp, stream, clear_cache = True)
+	print "reference: %.2f us per timestamp" % reference
+	print "parse_timestamp, unique timestamps: %.2f us per timestamp, %.1fx faster" % (unique_time, reference / unique_time)
+	print "parse_timestamp, %i messages per second: %.2f us per timestamp, %.1fx faster" % (STREAM_RATE, stream_time, reference / stream_time)
+
+if __name__ == '__main__':
+	main()
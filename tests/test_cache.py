@@ -0,0 +1,41 @@
+# Copyright 2013-2015 Julian Metzler
+
+"""
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tweetpony.cache import CACHE_INVALIDATIONS, CACHE_TTLS
+from tweetpony.endpoints import ENDPOINTS, get_endpoint
+
+class CacheTablesTestCase(unittest.TestCase):
+	def test_invalidated_families_exist(self):
+		families = set([get_endpoint(name).family for name in ENDPOINTS])
+		for name, invalidated in CACHE_INVALIDATIONS.items():
+			self.assertTrue(name in ENDPOINTS, name)
+			for family in invalidated:
+				self.assertTrue(family in families, "%s invalidates unknown family '%s'" % (name, family))
+	
+	def test_cached_endpoints_exist(self):
+		for name in CACHE_TTLS:
+			self.assertTrue(name in ENDPOINTS, name)
+			self.assertFalse(get_endpoint(name).post, name)
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,90 @@
+# Copyright 2013-2015 Julian Metzler
+
+"""
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tweetpony
+from tweetpony.endpoints import get_endpoint
+
+USER = {'id': 12, 'id_str': "12", 'screen_name': "Mobiru_Kinsei", 'name': "Mobiru", 'created_at': "Wed Aug 27 13:08:45 +0000 2008", 'followers_count': 42}
+STATUSES = [
+	{'id': 1, 'id_str': "1", 'text': "Hello", 'created_at': "Wed Aug 27 13:08:45 +0000 2008", 'user': USER, 'entities': {'hashtags': [{'text': "pony", 'indices': [0, 5]}]}},
+	{'id': 2, 'id_str': "2", 'text': "World", 'created_at': "Thu Aug 28 13:08:45 +0000 2008", 'user': USER, 'lang': "en"},
+]
+SEARCH_RESULT = {'statuses': STATUSES, 'search_metadata': {'count': 2, 'max_id': 2}}
+
+MODES = {
+	'regular': {},
+	'lazy': {'lazy_models': True},
+	'compact': {'compact_models': True},
+}
+
+class ModelJSONTestCase(unittest.TestCase):
+	def build(self, mode, name, data):
+		api = tweetpony.API("ck", "cs", load_user = False, json_in_models = True, **MODES[mode])
+		raw = json.dumps(data)
+		return (raw, api.build_model(get_endpoint(name), json.loads(raw), raw))
+	
+	def check_items(self, items, data):
+		self.assertEqual(len(items), len(data))
+		for item, item_data in zip(items, data):
+			self.assertEqual(json.loads(item.json), item_data)
+	
+	def test_collection_items(self):
+		for mode in MODES:
+			raw, statuses = self.build(mode, 'user_timeline', STATUSES)
+			self.assertEqual(statuses.json, raw)
+			self.check_items(statuses, STATUSES)
+	
+	def test_mixed_collection_items(self):
+		for mode in MODES:
+			raw, result = self.build(mode, 'search_tweets', SEARCH_RESULT)
+			self.assertEqual(result.json, raw)
+			self.check_items(result, STATUSES)
+	
+	def test_single_model(self):
+		for mode in MODES:
+			raw, user = self.build(mode, 'get_user', USER)
+			self.assertEqual(user.json, raw)
+
+class ModelEqualityTestCase(unittest.TestCase):
+	def build(self, mode, data):
+		options = tweetpony.ModelOptions(lazy = mode == 'lazy', compact = mode == 'compact')
+		return tweetpony.Status.from_json(json.loads(json.dumps(data)), options)
+	
+	def test_same_data(self):
+		for mode in MODES:
+			self.assertEqual(self.build(mode, STATUSES[0]), self.build(mode, STATUSES[0]))
+			self.assertFalse(self.build(mode, STATUSES[0]) != self.build(mode, STATUSES[0]))
+	
+	def test_different_data(self):
+		for mode in MODES:
+			self.assertNotEqual(self.build(mode, STATUSES[0]), self.build(mode, STATUSES[1]))
+			self.assertFalse(self.build(mode, STATUSES[0]) == self.build(mode, STATUSES[1]))
+	
+	def test_across_modes(self):
+		for mode in MODES:
+			self.assertEqual(self.build('compact', STATUSES[0]), self.build(mode, STATUSES[0]))
+			self.assertEqual(self.build(mode, STATUSES[0]), self.build('compact', STATUSES[0]))
+
+if __name__ == '__main__':
+	unittest.main()
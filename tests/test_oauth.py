@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+# Copyright 2013-2015 Julian Metzler
+
+"""
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import binascii
+import hashlib
+import hmac
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tweetpony
+from tweetpony.oauth import OAuthSigner
+from tweetpony.utils import quote
+
+class FixedAPI(tweetpony.API):
+	# Signs with a fixed nonce and timestamp, so that signatures can be compared
+	nonce = "kYjzVBB8Y0ZFabxSWbWovY3uYSQ2pTgmZeNu2VS4cg"
+	timestamp = "1318622958"
+	
+	def get_oauth_header_data(self, callback_url = None):
+		auth_data = tweetpony.API.get_oauth_header_data(self, callback_url = callback_url)
+		auth_data['oauth_nonce'] = self.nonce
+		auth_data['oauth_timestamp'] = self.timestamp
+		return auth_data
+
+class ReferenceAPI(FixedAPI):
+	# The straightforward signing code TweetPony used before OAuthSigner, kept to check that the signatures are the same
+	def get_oauth_header(self, method, url, callback_url = None, get = None, post = None, multipart = False):
+		if not multipart:
+			get_data = (get or {}).items()
+			post_data = (post or {}).items()
+		else:
+			get_data = []
+			post_data = []
+		auth_data = self.get_oauth_header_data(callback_url = callback_url).items()
+		data = [(quote(key, safe = "~"), quote(value, safe = "~")) for key, value in get_data + post_data + auth_data]
+		data = sorted(sorted(data), key = lambda item: item[0].upper())
+		param_string = "&".join(["%s=%s" % (key, value) for key, value in data])
+		signature_base = "&".join([method.upper(), quote(url, safe = "~"), quote(param_string, safe = "~")])
+		if self.request_token:
+			token_secret = quote(self.request_token_secret, safe = "~")
+		elif self.access_token:
+			token_secret = quote(self.access_token_secret, safe = "~")
+		else:
+			token_secret = ""
+		signing_key = "&".join([quote(self.consumer_secret, safe = "~"), token_secret])
+		signature = hmac.new(signing_key, signature_base, hashlib.sha1)
+		signature = quote(binascii.b2a_base64(signature.digest())[:-1], safe = "~")
+		auth_data.append(('oauth_signature', signature))
+		return self.generate_oauth_header(dict(auth_data))
+
+# From Twitter's "Creating a signature" documentation
+SIGNATURE_EXAMPLE = {
+	'consumer_key': "xvz1evFS4wEEPTGEFPHBog",
+	'consumer_secret': "kAcSOqF21Fu85e7zjz7ZN2U4ZRhfV3WpwPAoE3Z7kBw",
+	'access_token': "370773112-GmHxMAgYyLbNEtIKZeRNFsMKPR9EyMZeS9weJAEb",
+	'access_token_secret': "LswwdoUaIvS8ltyTt5jkRh4J50vUPVVHtR2YPi5kE",
+	'nonce': "kYjzVBB8Y0ZFabxSWbWovY3uYSQ2pTgmZeNu2VS4cg",
+	'timestamp': "1318622958",
+	'url': "https://api.twitter.com/1.1/statuses/update.json",
+	'post': {'status': "Hello Ladies + Gentlemen, a signed OAuth request!", 'include_entities': "true"},
+	'signature_base': "POST&https%3A%2F%2Fapi.twitter.com%2F1.1%2Fstatuses%2Fupdate.json&include_entities%3Dtrue%26oauth_consumer_key%3Dxvz1evFS4wEEPTGEFPHBog%26oauth_nonce%3DkYjzVBB8Y0ZFabxSWbWovY3uYSQ2pTgmZeNu2VS4cg%26oauth_signature_method%3DHMAC-SHA1%26oauth_timestamp%3D1318622958%26oauth_token%3D370773112-GmHxMAgYyLbNEtIKZeRNFsMKPR9EyMZeS9weJAEb%26oauth_version%3D1.0%26status%3DHello%2520Ladies%2520%252B%2520Gentlemen%252C%2520a%2520signed%2520OAuth%2520request%2521",
+	'signature': "hCtSmYh%2BiHYCEqBWrE7C7hYmtUk%3D",
+}
+
+# From Twitter's documentation of the request_token endpoint
+REQUEST_TOKEN_EXAMPLE = {
+	'consumer_key': "cChZNFj6T5R0TigYB9yd1w",
+	'consumer_secret': "L8qq9PZyRg6ieKGEKhZolGC0vJWLw8iEJ88DRdyOg",
+	'nonce': "ea9ec8429b68d6b77cd5600adbbb0456",
+	'timestamp': "1318467427",
+	'url': "https://api.twitter.com/oauth/request_token",
+	'callback_url': "http://localhost/sign-in-with-twitter/",
+	'signature': "F1Li3tvehgcraF8DMJ7OyxO4w9Y%3D",
+}
+
+RANDOM_CHARS = u"aZ09 -._~!*'()+,/:;=?@&%#$é☃"
+RANDOM_NAMES = ['status', 'include_entities', 'screen_name', 'user_id', 'a_b', 'aB', 'Ab', 'a', 'A', 'count', 'cursor', 'name_', 'nameX']
+
+def get_signature(header):
+	for item in header['Authorization'][6:].split(", "):
+		name, value = item.split("=", 1)
+		if name == 'oauth_signature':
+			return value.strip('"')
+
+class OAuthTestCase(unittest.TestCase):
+	def test_signature_base(self):
+		example = SIGNATURE_EXAMPLE
+		params = example['post'].items() + [
+			('oauth_consumer_key', example['consumer_key']),
+			('oauth_nonce', example['nonce']),
+			('oauth_signature_method', "HMAC-SHA1"),
+			('oauth_timestamp', example['timestamp']),
+			('oauth_token', example['access_token']),
+			('oauth_version', "1.0"),
+		]
+		signer = OAuthSigner(example['consumer_secret'], example['access_token_secret'])
+		self.assertEqual(signer.get_signature_base("post", example['url'], params), example['signature_base'])
+	
+	def test_signature(self):
+		example = SIGNATURE_EXAMPLE
+		api = FixedAPI(example['consumer_key'], example['consumer_secret'], example['access_token'], example['access_token_secret'], load_user = False)
+		api.nonce = example['nonce']
+		api.timestamp = example['timestamp']
+		header = api.get_oauth_header("POST", example['url'], post = example['post'])
+		self.assertEqual(get_signature(header), example['signature'])
+	
+	def test_request_token_signature(self):
+		example = REQUEST_TOKEN_EXAMPLE
+		api = FixedAPI(example['consumer_key'], example['consumer_secret'], load_user = False)
+		api.nonce = example['nonce']
+		api.timestamp = example['timestamp']
+		header = api.get_oauth_header("POST", example['url'], callback_url = example['callback_url'])
+		self.assertEqual(get_signature(header), example['signature'])
+	
+	def test_same_headers_as_reference(self):
+		# Random requests, including unicode and reserved characters, must get byte-identical headers
+		rand = random.Random(5)
+		def text():
+			return u"".join([rand.choice(RANDOM_CHARS) for i in range(rand.randint(0, 12))])
+		def header(api, args):
+			try:
+				return api.get_oauth_header(*args)
+			except Exception as err:
+				return type(err)
+		for i in range(2000):
+			consumer_secret, token_secret, request_token_secret = text(), text(), text().encode('utf-8')
+			token = rand.choice([None, "at", request_token_secret])
+			apis = [cls("ck", consumer_secret, token, token_secret, load_user = False) for cls in (FixedAPI, ReferenceAPI)]
+			request_token = rand.random() < 0.2
+			for api in apis:
+				api.nonce = "%x" % rand.getrandbits(64)
+				api.timestamp = str(rand.randint(0, 2 ** 31))
+				if request_token:
+					api.set_request_token("rt", request_token_secret)
+			apis[1].nonce, apis[1].timestamp = apis[0].nonce, apis[0].timestamp
+			get = dict([(rand.choice(RANDOM_NAMES), rand.choice([text(), text().encode('utf-8'), rand.randint(-5, 10 ** 12), True])) for j in range(rand.randint(0, 4))])
+			post = dict([(rand.choice(RANDOM_NAMES), text()) for j in range(rand.randint(0, 3))])
+			args = (rand.choice(["GET", "post"]), rand.choice(["https://api.twitter.com/1.1/statuses/update.json", u"http://127.0.0.1:80/1.1/x~y.json"]), rand.choice([None, "http://x/y?z=1"]), get, post, rand.random() < 0.1)
+			self.assertEqual(header(apis[0], args), header(apis[1], args))
+
+if __name__ == '__main__':
+	unittest.main()
@@ -16,6 +16,13 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
 from .api import *
+from .credentials import *
+
+try:
+	from .aio import AsyncAPI, AsyncConnectionPool
+except (ImportError, SyntaxError):
+	# The asynchronous API requires Python 3.5+ and aiohttp
+	pass
 
 # Consumer key / secret of the "TweetPony" application. Can be used for example purposes.
 CONSUMER_KEY = "FawBJCoKmeSceTXuphnw"
@@ -0,0 +1,328 @@
+# Copyright 2013-2015 Julian Metzler
+
+"""
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+# This module requires Python 3.5 or newer
+
+import asyncio
+import json
+import os
+
+try:
+	import aiohttp
+except ImportError:
+	raise ImportError("It seems like you don't have the 'aiohttp' module installed which is required for the asynchronous API. Please install it first.")
+
+from .api import API, StreamProcessor
+from .endpoints import COMPILED_ENDPOINTS, Endpoint, get_endpoint
+from .error import APIError
+from .oauth import BEARER_TOKENS, get_basic_auth_header
+from .stream import STREAM_ENTITIES, STREAM_STALL_TIMEOUT, StreamBackoff, get_framer
+
+NETWORK_ERRORS = (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError)
+
+class AsyncConnectionPool(object):
+	# limit is the total number of connections, limit_per_host the number of connections per host
+	# and concurrency the number of REST requests running at the same time (streams don't count)
+	def __init__(self, limit = 100, limit_per_host = 10, concurrency = None, connect_timeout = None, read_timeout = None):
+		self.limit = limit
+		self.limit_per_host = limit_per_host
+		self.concurrency = concurrency or limit
+		self.connect_timeout = connect_timeout
+		self.read_timeout = read_timeout
+		self.session = None
+		self.semaphore = None
+	
+	def get_session(self):
+		# The session has to be created inside the event loop
+		if self.session is None or self.session.closed:
+			connector = aiohttp.TCPConnector(limit = self.limit, limit_per_host = self.limit_per_host)
+			timeout = aiohttp.ClientTimeout(total = None, sock_connect = self.connect_timeout, sock_read = self.read_timeout)
+			# The pool may be shared by the API instances of several users, which mustn't share cookies
+			self.session = aiohttp.ClientSession(connector = connector, timeout = timeout, cookie_jar = aiohttp.DummyCookieJar())
+			self.semaphore = asyncio.Semaphore(self.concurrency)
+		return self.session
+	
+	async def close(self):
+		if self.session is not None:
+			await self.session.close()
+			self.session = None
+
+class AsyncAPI(API):
+	def __init__(self, consumer_key, consumer_secret, access_token = None, access_token_secret = None, pool = None, **kwargs):
+		# Loading the user requires a request, which can't be done in the constructor; use verify() instead
+		kwargs['load_user'] = False
+		API.__init__(self, consumer_key, consumer_secret, access_token, access_token_secret, pool = pool or AsyncConnectionPool(), **kwargs)
+		self.bearer_token_lock = asyncio.Lock()
+	
+	async def __aenter__(self):
+		return self
+	
+	async def __aexit__(self, exc_type, exc_value, traceback):
+		await self.close()
+	
+	async def close(self):
+		await self.pool.close()
+	
+	def set_access_token(self, access_token, access_token_secret):
+		self.access_token = access_token
+		self.access_token_secret = access_token_secret
+	
+	async def verify(self):
+		self.user = await self.verify_credentials()
+		return self.user
+	
+	async def update_rate_limits(self, resources = None):
+		self.rate_limits.load(await self.rate_limit_status(resources = resources))
+		return self.rate_limits
+	
+	# The helpers for batches, lookups and paging are built on threads and blocking calls;
+	# run several calls at once with asyncio.gather instead
+	def batch(self, calls, workers = None, ordered = False):
+		raise NotImplementedError("Batches are not available asynchronously. Please use asyncio.gather instead.")
+	
+	def map_call(self, endpoint, values, workers = None, ordered = False):
+		raise NotImplementedError("Batches are not available asynchronously. Please use asyncio.gather instead.")
+	
+	def coalescer(self, window = 0.05, max_batch = None):
+		raise NotImplementedError("Lookup coalescing is not available asynchronously. Please use the API class.")
+	
+	def cursor(self, endpoint, **kwargs):
+		raise NotImplementedError("Cursors are not available asynchronously. Please use the API class.")
+	
+	def timeline(self, endpoint, **kwargs):
+		raise NotImplementedError("Timelines are not available asynchronously. Please use the API class.")
+	
+	def collect_ids(self, endpoint, limit = None, **kwargs):
+		raise NotImplementedError("Collecting IDs is not available asynchronously. Please use the API class.")
+	
+	def get_request_token(self, callback_url = None):
+		raise NotImplementedError("The authentication flow is not available asynchronously. Please use the API class to obtain access tokens.")
+	
+	def get_auth_url(self, callback_url = None, force_login = False, screen_name = None, token = None):
+		raise NotImplementedError("The authentication flow is not available asynchronously. Please use the API class to obtain access tokens.")
+	
+	def authenticate(self, verifier):
+		raise NotImplementedError("The authentication flow is not available asynchronously. Please use the API class to obtain access tokens.")
+	
+	async def bearer_token_request(self, endpoint, data):
+		url = self.build_request_url("/oauth2/", endpoint)
+		session = self.pool.get_session()
+		async with session.post(url, data = data, headers = get_basic_auth_header(self.consumer_key, self.consumer_secret)) as response:
+			text = await response.text()
+			if response.status != 200:
+				raise self.get_response_error(response.status, text, response.headers)
+		return text
+	
+	async def obtain_bearer_token(self, invalid = None):
+		key = (self.consumer_key, self.consumer_secret)
+		async with self.bearer_token_lock:
+			token = BEARER_TOKENS.get(key)
+			if token is None or token == invalid:
+				token = BEARER_TOKENS[key] = self.parse_bearer_token(await self.bearer_token_request('token', {'grant_type': "client_credentials"}))
+		self.bearer_token = token
+		return token
+	
+	async def invalidate_bearer_token(self):
+		if self.bearer_token is None:
+			return
+		await self.bearer_token_request('invalidate_token', {'access_token': self.bearer_token})
+		self.forget_bearer_token()
+	
+	def build_form_data(self, post, files):
+		form = aiohttp.FormData()
+		for key, value in (post or {}).items():
+			form.add_field(key, value)
+		for key, value in files.items():
+			form.add_field(key, value, filename = os.path.basename(getattr(value, 'name', key)))
+		return form
+	
+	async def do_request(self, method, url, callback_url = None, get = None, post = None, files = None, stream = False, is_json = True, endpoint = None, timeout = None):
+		if files == {}:
+			files = None
+		session = self.pool.get_session()
+		if timeout is None and self.timeout is not None:
+			# Like with requests, the timeout applies to connecting and to every read, not to the whole response
+			timeout = aiohttp.ClientTimeout(sock_connect = self.timeout, sock_read = self.timeout)
+		attempt = 1
+		token_renewed = False
+		while True:
+			if self.wait_on_rate_limit and endpoint is not None:
+				seconds = self.rate_limits.wait_time(endpoint)
+				if seconds:
+					await asyncio.sleep(seconds)
+			if self.app_auth and self.bearer_token is None:
+				await self.obtain_bearer_token()
+			full_url, header = self.prepare_request(method, url, callback_url, get, post, files)
+			data = self.build_form_data(post, files) if files else post
+			try:
+				if stream:
+					response = await session.request(method.upper(), full_url, data = data, headers = header, timeout = timeout)
+					status = response.status
+					text = await response.text() if status != 200 else None
+				else:
+					async with self.pool.semaphore:
+						async with session.request(method.upper(), full_url, data = data, headers = header, timeout = timeout) as response:
+							status = response.status
+							text = await response.text()
+			except NETWORK_ERRORS:
+				delay = self.get_retry_delay(method, attempt, stream)
+				if delay is None:
+					raise
+				await asyncio.sleep(delay)
+				self.rewind_files(files)
+				attempt += 1
+				continue
+			if endpoint is not None:
+				self.rate_limits.update(endpoint, response.headers)
+				if status == 429 and self.wait_on_rate_limit and self.rate_limits.wait_time(endpoint):
+					response.release()
+					self.rewind_files(files)
+					continue
+			if status == 401 and self.app_auth and not token_renewed and self.get_response_error(status, text, response.headers).code == 89:
+				response.release()
+				await self.obtain_bearer_token(invalid = self.bearer_token)
+				token_renewed = True
+				self.rewind_files(files)
+				continue
+			if status != 200:
+				delay = self.get_retry_delay(method, attempt, stream, status, response.headers)
+				if delay is not None:
+					response.release()
+					await asyncio.sleep(delay)
+					self.rewind_files(files)
+					attempt += 1
+					continue
+			break
+		if status != 200:
+			response.release()
+			raise self.get_response_error(status, text, response.headers)
+		if stream:
+			return response
+		if is_json:
+			try:
+				return json.loads(text)
+			except ValueError:
+				return text
+		else:
+			return text
+	
+	async def upload_media(self, media):
+		ids = []
+		for item in media:
+			url = self.build_request_url(self.root, "media/upload.json", host = "upload.twitter.com")
+			resp = await self.do_request("POST", url, files = {'media': item}, endpoint = "/media/upload")
+			ids.append(resp['media_id'])
+		return self.parse_param('media_ids', ids)[1]
+	
+	async def process_stream(self, resp, processor, delimited = None):
+		framer = get_framer(delimited)
+		entities = getattr(processor, 'entities', STREAM_ENTITIES)
+		options = self.get_model_options(processor)
+		try:
+			async for chunk in resp.content.iter_any():
+				for line in framer.feed(chunk):
+					entity = self.build_stream_entity(line, entities, options)
+					if entity is None:
+						continue
+					# Processors may handle entities with coroutines
+					result = processor.process_entity(entity)
+					if asyncio.iscoroutine(result):
+						result = await result
+					if result == False:
+						return True
+			return False
+		finally:
+			resp.close()
+	
+	async def run_stream(self, endpoint, url, get, post, files, processor, delimited = None):
+		backoff = StreamBackoff()
+		timeout = aiohttp.ClientTimeout(sock_connect = self.pool.connect_timeout, sock_read = getattr(processor, 'stall_timeout', STREAM_STALL_TIMEOUT))
+		while True:
+			try:
+				resp = await self.do_request(endpoint.method, url, get = get, post = post, files = files, stream = True, endpoint = endpoint, timeout = timeout)
+			except APIError as err:
+				if backoff.is_fatal(err.status):
+					raise
+				error = err
+				delay = backoff.get_delay(err.status)
+			except NETWORK_ERRORS as err:
+				error = err
+				delay = backoff.get_delay()
+			else:
+				backoff.reset()
+				try:
+					if await self.process_stream(resp, processor, delimited = delimited):
+						return
+					error = None
+				except NETWORK_ERRORS as err:
+					error = err
+				delay = backoff.get_delay()
+			result = processor.on_reconnect(error, delay)
+			if asyncio.iscoroutine(result):
+				result = await result
+			if result == False:
+				return
+			await asyncio.sleep(delay)
+	
+	async def api_call(self, endpoint, *args, **kwargs):
+		if not isinstance(endpoint, Endpoint):
+			endpoint = get_endpoint(endpoint)
+		if endpoint.stream:
+			processor = kwargs.pop('processor', None) or StreamProcessor(self)
+			reconnect = kwargs.pop('reconnect', False)
+		
+		url, kwargs, files = self.prepare_call(endpoint, args, kwargs)
+		
+		if endpoint.name == 'update_status_with_media':
+			kwargs['media_ids'] = await self.upload_media(kwargs.pop('media'))
+		
+		if endpoint.post:
+			get_data = None
+			post_data = kwargs
+		else:
+			get_data = kwargs
+			post_data = None
+		
+		if endpoint.stream and reconnect:
+			await self.run_stream(endpoint, url, get_data, post_data, files, processor, delimited = kwargs.get('delimited'))
+		elif endpoint.stream:
+			resp = await self.do_request(endpoint.method, url, get = get_data, post = post_data, files = files, stream = True, endpoint = endpoint)
+			await self.process_stream(resp, processor, delimited = kwargs.get('delimited'))
+		else:
+			cache_key = self.cache.get_key(self, endpoint, url, get_data) if self.cache is not None else None
+			raw = self.cache.get(cache_key) if cache_key is not None else None
+			if raw is None:
+				raw = await self.do_request(endpoint.method, url, get = get_data, post = post_data, files = files, is_json = False, endpoint = endpoint)
+				if cache_key is not None:
+					self.cache.set(cache_key, endpoint, raw)
+			try:
+				resp = json.loads(raw)
+			except ValueError:
+				resp = raw
+			if endpoint.post and self.cache is not None:
+				self.cache.invalidate(endpoint)
+			return self.build_model(endpoint, resp, raw if self.json_in_models else None)
+
+def async_endpoint_method(endpoint):
+	async def method(self, *args, **kwargs):
+		return await self.api_call(endpoint, *args, **kwargs)
+	method.__name__ = endpoint.name
+	return method
+
+for endpoint in COMPILED_ENDPOINTS.values():
+	setattr(AsyncAPI, endpoint.name, async_endpoint_method(endpoint))
+del endpoint
@@ -15,42 +15,47 @@ You should have received a copy of the GNU Affero General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
-import base64
-import binascii
-import hashlib
-import hmac
 import json
+import multiprocessing
 import random
+try:
+	import cPickle as pickle
+except ImportError:
+	import pickle
 try:
 	import requests
 except ImportError:
 	raise ImportError("It seems like you don't have the 'requests' module installed which is required for TweetPony to work. Please install it first.")
+import sys
+import tempfile
+import threading
 import time
 import urllib
 import urlparse
+import warnings
+from collections import deque
+from functools import partial
 from threading import Thread
 
+from batch import *
+from cache import *
+from coalesce import *
+from connection import ConnectionPool
 from endpoints import *
 from error import *
+from ids import *
 from models import *
-from utils import quote
-
-class ArgList(tuple):
-	def __getitem__(self, index):
-		if index > len(self) - 1:
-			return None
-		else:
-			return tuple.__getitem__(self, index)
+from oauth import *
+from paging import *
+from ratelimit import *
+from retry import *
+from stream import *
 
-class KWArgDict(dict):
-	def __getitem__(self, key):
-		if key not in self.keys():
-			return None
-		else:
-			return dict.__getitem__(self, key)
+FILE_PARAMS = frozenset(['image', 'media', 'banner'])
+NETWORK_ERRORS = (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError, requests.exceptions.Timeout)
 
 class API(object):
-	def __init__(self, consumer_key, consumer_secret, access_token = None, access_token_secret = None, host = "api.twitter.com", root = "/1.1/", oauth_host = "api.twitter.com", oauth_root = "/oauth/", secure = True, timeout = None, load_user = True, json_in_models = False):
+	def __init__(self, consumer_key, consumer_secret, access_token = None, access_token_secret = None, host = "api.twitter.com", root = "/1.1/", oauth_host = "api.twitter.com", oauth_root = "/oauth/", secure = True, timeout = None, load_user = True, json_in_models = False, pool = None, lazy_models = False, compact_models = False, wait_on_rate_limit = False, retry_policy = None, cache = None, user_map = None, app_auth = False, bearer_token = None):
 		self.consumer_key = consumer_key
 		self.consumer_secret = consumer_secret
 		self.access_token = access_token
@@ -61,19 +66,28 @@ class API(object):
 		self.oauth_root = oauth_root
 		self.secure = secure
 		self.timeout = timeout
+		self.pool = pool or ConnectionPool()
 		self.load_user = load_user
-		self._endpoint = None
-		self._multipart = False
 		self.json_in_models = json_in_models
+		# user_map can be True to share users within every response or a UserMap to share them between responses
+		self.user_map = user_map
+		self.model_options = ModelOptions(lazy = lazy_models, compact = compact_models, users = user_map if isinstance(user_map, UserMap) else None)
+		self.wait_on_rate_limit = wait_on_rate_limit
+		self.rate_limits = RateLimitTable()
+		self.retry_policy = retry_policy
+		self.cache = cache
 		self.request_token = None
 		self.request_token_secret = None
-		self.user = self.verify_credentials() if self.load_user and self.access_token and self.access_token_secret else DummyUser()
+		self.oauth_signer = None
+		# With app-only authentication, requests carry a bearer token instead of being signed
+		self.app_auth = app_auth or bearer_token is not None
+		self.bearer_token = bearer_token
+		self.user = self.verify_credentials() if self.load_user and self.access_token and self.access_token_secret and not self.app_auth else DummyUser()
 	
 	def __getattr__(self, attr):
 		if attr.startswith("__"):
 			return object.__getattr__(self, attr)
-		self._endpoint = attr
-		return self.api_call
+		return partial(self.api_call, attr)
 	
 	def set_access_token(self, access_token, access_token_secret):
 		self.access_token = access_token
@@ -84,6 +98,28 @@ class API(object):
 	def verify(self):
 		self.user = self.verify_credentials()
 	
+	def update_rate_limits(self, resources = None):
+		self.rate_limits.load(self.rate_limit_status(resources = resources))
+		return self.rate_limits
+	
+	def batch(self, calls, workers = BATCH_WORKERS, ordered = False):
+		return run_batch(self, calls, workers = workers, ordered = ordered)
+	
+	def map_call(self, endpoint, values, workers = BATCH_WORKERS, ordered = False):
+		return map_call(self, endpoint, values, workers = workers, ordered = ordered)
+	
+	def coalescer(self, window = 0.05, max_batch = LOOKUP_BATCH_SIZE):
+		return LookupCoalescer(self, window = window, max_batch = max_batch)
+	
+	def cursor(self, endpoint, **kwargs):
+		return Cursor(self, endpoint, **kwargs)
+	
+	def timeline(self, endpoint, **kwargs):
+		return Timeline(self, endpoint, **kwargs)
+	
+	def collect_ids(self, endpoint, limit = None, **kwargs):
+		return collect_ids(self, endpoint, limit = limit, **kwargs)
+	
 	def set_request_token(self, request_token, request_token_secret):
 		self.request_token = request_token
 		self.request_token_secret = request_token_secret
@@ -92,7 +128,7 @@ class API(object):
 		return dict([(key, values[0]) for key, values in urlparse.parse_qs(qs).iteritems()])
 	
 	def oauth_generate_nonce(self):
-		return base64.b64encode(hashlib.sha1(str(random.getrandbits(256))).digest(), random.choice(['rA','aZ','gQ','hH','hG','aR','DD'])).rstrip('==')
+		return "%032x" % random.getrandbits(128)
 	
 	def get_oauth_header_data(self, callback_url = None):
 		auth_data = {
@@ -113,36 +149,29 @@ class API(object):
 	def generate_oauth_header(self, auth_data):
 		return {'Authorization': "OAuth %s" % ", ".join(['%s="%s"' % item for item in auth_data.items()])}
 	
-	def get_oauth_header(self, method, url, callback_url = None, get = None, post = None):
-		if not self._multipart:
-			get_data = (get or {}).items()
-			post_data = (post or {}).items()
-		else:
-			get_data = []
-			post_data = []
-		auth_data = self.get_oauth_header_data(callback_url = callback_url).items()
-		data = [(quote(key, safe = "~"), quote(value, safe = "~")) for key, value in get_data + post_data + auth_data]
-		data = sorted(sorted(data), key = lambda item: item[0].upper())
-		param_string = []
-		for key, value in data:
-			param_string.append("%s=%s" % (key, value))
-		param_string = "&".join(param_string)
-		signature_base = []
-		signature_base.append(method.upper())
-		signature_base.append(quote(url, safe = "~"))
-		signature_base.append(quote(param_string, safe = "~"))
-		signature_base = "&".join(signature_base)
+	def get_oauth_signer(self):
+		# The signer is kept until the secrets change
 		if self.request_token:
-			token_secret = quote(self.request_token_secret, safe = "~")
+			token_secret = self.request_token_secret
 		elif self.access_token:
-			token_secret = quote(self.access_token_secret, safe = "~")
+			token_secret = self.access_token_secret
 		else:
-			token_secret = ""
-		signing_key = "&".join([quote(self.consumer_secret, safe = "~"), token_secret])
-		signature = hmac.new(signing_key, signature_base, hashlib.sha1)
-		signature = quote(binascii.b2a_base64(signature.digest())[:-1], safe = "~")
-		auth_data.append(('oauth_signature', signature))
-		return self.generate_oauth_header(dict(auth_data))
+			token_secret = None
+		signer = self.oauth_signer
+		if signer is None or signer.secrets != (self.consumer_secret, token_secret):
+			signer = self.oauth_signer = OAuthSigner(self.consumer_secret, token_secret)
+		return signer
+	
+	def get_oauth_header(self, method, url, callback_url = None, get = None, post = None, multipart = False):
+		auth_data = self.get_oauth_header_data(callback_url = callback_url)
+		params = list(auth_data.items())
+		if not multipart:
+			if get:
+				params.extend(get.items())
+			if post:
+				params.extend(post.items())
+		auth_data['oauth_signature'] = self.get_oauth_signer().sign(method, url, params)
+		return self.generate_oauth_header(auth_data)
 	
 	def build_request_url(self, root, endpoint, get_data = None, host = None):
 		host = host or self.host
@@ -153,47 +182,141 @@ class API(object):
 			url += "?%s" % qs
 		return url
 	
-	def do_request(self, method, url, callback_url = None, get = None, post = None, files = None, stream = False, is_json = True):
-		if files == {}:
-			files = None
-		self._multipart = files is not None
-		header = self.get_oauth_header(method, url, callback_url, get, post)
+	def bearer_token_request(self, endpoint, data):
+		# Requests to the oauth2 endpoints are authenticated with the consumer key and secret
+		url = self.build_request_url("/oauth2/", endpoint)
+		response = self.pool.request("POST", url, data = data, headers = get_basic_auth_header(self.consumer_key, self.consumer_secret), timeout = self.timeout)
+		if response.status_code != 200:
+			raise self.get_response_error(response.status_code, response.text, response.headers)
+		return response.text
+	
+	def parse_bearer_token(self, text):
+		data = json.loads(text)
+		if data.get('token_type') != "bearer":
+			raise APIError(code = None, description = "Unexpected token type: %s" % data.get('token_type'))
+		return data['access_token']
+	
+	def obtain_bearer_token(self, invalid = None):
+		# Uses the bearer token another API instance of the same application obtained, if any.
+		# invalid is a token that has been rejected and must not be used again.
+		key = (self.consumer_key, self.consumer_secret)
+		with BEARER_TOKENS_LOCK:
+			token = BEARER_TOKENS.get(key)
+			if token is None or token == invalid:
+				token = BEARER_TOKENS[key] = self.parse_bearer_token(self.bearer_token_request('token', {'grant_type': "client_credentials"}))
+		self.bearer_token = token
+		return token
+	
+	def forget_bearer_token(self):
+		key = (self.consumer_key, self.consumer_secret)
+		with BEARER_TOKENS_LOCK:
+			if BEARER_TOKENS.get(key) == self.bearer_token:
+				del BEARER_TOKENS[key]
+		self.bearer_token = None
+	
+	def invalidate_bearer_token(self):
+		if self.bearer_token is None:
+			return
+		self.bearer_token_request('invalidate_token', {'access_token': self.bearer_token})
+		self.forget_bearer_token()
+	
+	def get_auth_header(self, method, url, callback_url = None, get = None, post = None, multipart = False):
+		if self.app_auth:
+			return {'Authorization': "Bearer %s" % (self.bearer_token or self.obtain_bearer_token())}
+		return self.get_oauth_header(method, url, callback_url, get, post, multipart)
+	
+	def prepare_request(self, method, url, callback_url = None, get = None, post = None, files = None):
+		header = self.get_auth_header(method, url, callback_url, get, post, multipart = files is not None)
 		if get:
 			full_url = url + "?" + urllib.urlencode(get)
 		else:
 			full_url = url
-		"""# DEBUG
-		info = "=" * 50 + "\n"
-		info += "Method:    %s\n" % method
-		info += "URL:       %s\n" % full_url
-		info += "Headers:   %s\n" % str(header)
-		info += "GET data:  %s\n" % str(get)
-		info += "POST data: %s\n" % str(post)
-		info += "Files:     %s\n" % str(files)
-		info += "Streaming: %s\n" % str(stream)
-		info += "JSON:      %s\n" % str(is_json)
-		info += "=" * 50
-		print info
-		# END DEBUG"""
-		if method.upper() == "POST":
-			response = requests.post(full_url, data = post, files = files, headers = header, stream = stream, timeout = self.timeout)
-		else:
-			response = requests.get(full_url, data = post, files = files, headers = header, stream = stream, timeout = self.timeout)
-		"""# DEBUG
-		print ("\nResponse:  %s\n" % response.text) + "=" * 50
-		# END DEBUG"""
-		if response.status_code != 200:
+		return (full_url, header)
+	
+	def get_response_error(self, status_code, text, headers):
+		try:
+			data = json.loads(text)
 			try:
-				data = response.json()
-				try:
-					raise APIError(code = data['errors'][0]['code'], description = data['errors'][0]['message'], body = response.text or None)
-				except TypeError:
-					raise APIError(code = None, description = data['errors'])
-			except APIError:
-				raise
-			except:
-				description = " ".join(response.headers['status'].split()[1:]) if response.headers.get('status', None) else "Unknown Error"
-				raise APIError(code = response.status_code, description = description, body = response.text or None)
+				return APIError(code = data['errors'][0]['code'], description = data['errors'][0]['message'], body = text or None, status = status_code)
+			except TypeError:
+				return APIError(code = None, description = data['errors'], status = status_code)
+		except:
+			description = " ".join(headers['status'].split()[1:]) if headers.get('status', None) else "Unknown Error"
+			return APIError(code = status_code, description = description, body = text or None, status = status_code)
+	
+	def rewind_files(self, files):
+		for value in (files or {}).values():
+			try:
+				value.seek(0)
+			except (AttributeError, ValueError):
+				pass
+	
+	def get_retry_delay(self, method, attempt, stream, status_code = None, headers = None):
+		# Reconnecting to streams is up to the caller
+		if self.retry_policy is None or stream:
+			return None
+		return self.retry_policy.get_delay(method, attempt, status_code, headers)
+	
+	def do_request(self, method, url, callback_url = None, get = None, post = None, files = None, stream = False, is_json = True, endpoint = None, timeout = None):
+		if files == {}:
+			files = None
+		attempt = 1
+		token_renewed = False
+		while True:
+			if self.wait_on_rate_limit and endpoint is not None:
+				self.rate_limits.wait(endpoint)
+			full_url, header = self.prepare_request(method, url, callback_url, get, post, files)
+			"""# DEBUG
+			info = "=" * 50 + "\n"
+			info += "Method:    %s\n" % method
+			info += "URL:       %s\n" % full_url
+			info += "Headers:   %s\n" % str(header)
+			info += "GET data:  %s\n" % str(get)
+			info += "POST data: %s\n" % str(post)
+			info += "Files:     %s\n" % str(files)
+			info += "Streaming: %s\n" % str(stream)
+			info += "JSON:      %s\n" % str(is_json)
+			info += "=" * 50
+			print info
+			# END DEBUG"""
+			try:
+				response = self.pool.request(method.upper(), full_url, data = post, files = files, headers = header, stream = stream, timeout = timeout or self.timeout)
+			except NETWORK_ERRORS:
+				delay = self.get_retry_delay(method, attempt, stream)
+				if delay is None:
+					raise
+				time.sleep(delay)
+				self.rewind_files(files)
+				attempt += 1
+				continue
+			"""# DEBUG
+			print ("\nResponse:  %s\n" % response.text) + "=" * 50
+			# END DEBUG"""
+			if endpoint is not None:
+				self.rate_limits.update(endpoint, response.headers)
+				if response.status_code == 429 and self.wait_on_rate_limit and self.rate_limits.wait_time(endpoint):
+					# Wait for the next window and try again
+					response.close()
+					self.rewind_files(files)
+					continue
+			if response.status_code == 401 and self.app_auth and not token_renewed and self.get_response_error(response.status_code, response.text, response.headers).code == 89:
+				# The bearer token has been invalidated, so get a new one once
+				response.close()
+				self.obtain_bearer_token(invalid = self.bearer_token)
+				token_renewed = True
+				self.rewind_files(files)
+				continue
+			if response.status_code != 200:
+				delay = self.get_retry_delay(method, attempt, stream, response.status_code, response.headers)
+				if delay is not None:
+					response.close()
+					time.sleep(delay)
+					self.rewind_files(files)
+					attempt += 1
+					continue
+			break
+		if response.status_code != 200:
+			raise self.get_response_error(response.status_code, response.text, response.headers)
 		if stream:
 			return response
 		if is_json:
@@ -237,21 +360,24 @@ class API(object):
 			# This only comes in here when we're uploading multiple images, so ignore it
 			return (key, value)
 		
-		if type(value) == bool:
+		t = type(value)
+		if t is str or t is unicode:
+			pass
+		elif t is bool:
 			value = "true" if value else "false"
-		elif type(value) in (tuple, list):
+		elif t is tuple or t is list:
 			value = ",".join([str(val) for val in value])
-		elif type(value) not in (str, unicode) and value is not None:
+		elif value is not None:
 			value = unicode(value)
 		return (key, value)
 	
 	def parse_params(self, params):
 		files = {}
-		_params = dict(params.items())
+		parsed_params = {}
 		for key, value in params.iteritems():
-			if value in [None, []]:
-				del _params[key]
-			if key in ['image', 'media', 'banner']:
+			if value is None or value == []:
+				continue
+			if key in FILE_PARAMS:
 				multiple_media = False
 				if type(value) is file:
 					try:
@@ -272,183 +398,248 @@ class API(object):
 								pass
 						elif type(item) in (str, unicode):
 							value[index] = open(item, 'rb')
-					_params[key] = value
 				
 				if not multiple_media:
-					del _params[key]
 					if key == 'media':
 						key = 'media[]'
 					files[key] = value
-		params = _params
-		parsed_params = dict([self.parse_param(key, value) for key, value in params.iteritems()])
+					continue
+			parsed_params[key] = self.parse_param(key, value)[1]
 		return (parsed_params, files)
 	
-	def parse_stream_entity(self, entity):
+	def parse_stream_entity(self, entity, entities = STREAM_ENTITIES, options = None):
 		try:
 			data = json.loads(entity)
 		except ValueError:
 			return None
-		keys = data.keys()
-		if 'delete' in keys:
-			instance = DeletionEvent.from_json(data['delete'])
-		elif 'scrub_geo' in keys:
-			instance = LocationDeletionEvent.from_json(data['scrub_geo'])
-		elif 'limit' in keys:
-			instance = LimitEvent.from_json(data['limit'])
-		elif 'status_withheld' in keys:
-			instance = WithheldStatusEvent.from_json(data['status_withheld'])
-		elif 'user_withheld' in keys:
-			instance = WithheldUserEvent.from_json(data['user_withheld'])
-		elif 'disconnect' in keys:
-			instance = DisconnectEvent.from_json(data['disconnect'])
-		elif 'friends' in keys:
-			instance = IDCollection.from_json(data['friends'])
-		elif 'target' in keys:
-			instance = Event.from_json(data)
-		elif 'direct_message' in keys:
-			instance = Message.from_json(data['direct_message'])
-		else:
-			instance = Status.from_json(data)
-		return instance
-	
-	def api_call(self, *args, **kwargs):
-		if self._endpoint not in ENDPOINTS and self._endpoint not in STREAM_ENDPOINTS:
-			raise NotImplementedError("API endpoint for method '%s' not found." % self._endpoint)
-		
-		stream = self._endpoint in STREAM_ENDPOINTS
-		if stream:
-			endpoints = STREAM_ENDPOINTS
-			processor = kwargs.get('processor', StreamProcessor(self))
-			if 'processor' in kwargs.keys():
-				del kwargs['processor']
-		else:
-			endpoints = ENDPOINTS
+		return entities.parse(data, options or self.model_options)
+	
+	def get_model_options(self, processor = None):
+		# Stream processors can have their own UserMap, while with user_map = True, every response gets a new one
+		user_map = getattr(processor, 'user_map', None)
+		if user_map is not None:
+			return self.model_options.with_users(user_map)
+		if self.user_map is True and processor is None:
+			return self.model_options.with_users(UserMap())
+		return self.model_options
+	
+	def prepare_call(self, endpoint, args, kwargs):
+		if args:
+			positional_kwargs = dict(zip(endpoint.positional_params, args))
+			duplicate_keys = [key for key, value in positional_kwargs.iteritems() if value is not None and kwargs.get(key) is not None]
+			if duplicate_keys:
+				raise ParameterError("Duplicate values for parameters: %s" % ", ".join(duplicate_keys))
+			
+			for key, value in positional_kwargs.iteritems():
+				if value is not None:
+					kwargs[key] = value
 		
-		args = ArgList(args)
 		kwargs, files = self.parse_params(kwargs)
-		kwargs = KWArgDict(kwargs)
-		data = endpoints[self._endpoint]
 		
-		if args:
-			keys = data['url_params'] + data['required_params'] + data['optional_params']
-			additional_kwargs, additional_files = self.parse_params(dict(zip(keys, args)))
-			used_keys = additional_kwargs.keys()
-			used_file_keys = additional_files.keys()
-			duplicate_keys = [key for key in used_keys if key in kwargs]
-			duplicate_file_keys = [key for key in used_file_keys if key in files]
-			
-			if duplicate_keys or duplicate_file_keys:
-				raise ParameterError("Duplicate values for parameters: %s" % ", ".join(duplicate_keys + duplicate_file_keys))
-			
-			kwargs.update(additional_kwargs)
-			files.update(additional_files)
-
-		missing_params = []
-		url_params = []
-		for param in data['url_params']:
-			p = kwargs.get(param)
-			if p is None:
-				missing_params.append(param)
-			else:
-				url_params.append(p)
-				del kwargs[param]
-		if missing_params:
-			raise ParameterError("Missing URL parameters: %s" % ", ".join(missing_params))
+		if endpoint.url_params:
+			missing_params = [param for param in endpoint.url_params if kwargs.get(param) is None]
+			if missing_params:
+				raise ParameterError("Missing URL parameters: %s" % ", ".join(missing_params))
+			path = endpoint.endpoint % tuple([kwargs.pop(param) for param in endpoint.url_params])
+		else:
+			path = endpoint.endpoint
 		
-		missing_params = []
-		for param in data['required_params']:
-			p = files.get(param) or kwargs.get(param)
-			if p is None:
-				missing_params.append(param)
-		if missing_params:
-			raise ParameterError("Missing required parameters: %s" % ", ".join(missing_params))
+		if endpoint.required_params:
+			missing_params = [param for param in endpoint.required_params if files.get(param) is None and kwargs.get(param) is None]
+			if missing_params:
+				raise ParameterError("Missing required parameters: %s" % ", ".join(missing_params))
 		
-		unsupported_params = []
-		for param in kwargs.keys():
-			if param not in data['url_params'] + data['required_params'] + data['optional_params']:
-				unsupported_params.append(param)
-		for param in files.keys():
-			if param not in data['url_params'] + data['required_params'] + data['optional_params']:
-				unsupported_params.append(param)
+		params = endpoint.params
+		unsupported_params = [param for param in kwargs if param not in params] + [param for param in files if param not in params]
 		if unsupported_params:
 			raise ParameterError("Unsupported parameters specified: %s" % ", ".join(unsupported_params))
 		
-		if self._endpoint == 'update_status_with_media':
-			# This is a 2-step process and different from the rest of the API calls, so we need to handle it differently
-			# First we upload all the media files and gather the assigned IDs
-			ids = []
-			for media in kwargs['media']:
-				url = self.build_request_url(self.root, "media/upload.json", host = "upload.twitter.com")
-				resp = self.do_request("POST", url, files = {'media': media})
-				ids.append(resp['media_id'])
-			
-			# Now we have our IDs and can continue with a normal status update, except we pass the additional id list parameter
-			del kwargs['media']
-			kwargs['media_ids'] = self.parse_param('media_ids', ids)[1]
+		url = self.build_request_url(self.root, path, host = endpoint.host)
+		return (url, kwargs, files)
+	
+	def upload_media(self, media):
+		ids = []
+		for item in media:
+			url = self.build_request_url(self.root, "media/upload.json", host = "upload.twitter.com")
+			resp = self.do_request("POST", url, files = {'media': item}, endpoint = "/media/upload")
+			ids.append(resp['media_id'])
+		return self.parse_param('media_ids', ids)[1]
+	
+	def build_model(self, endpoint, resp, raw = None):
+		if endpoint.model is None:
+			return resp
+		model = endpoint.model.from_json(resp, self.get_model_options())
+		if raw is not None:
+			attach_json(model, raw, resp)
+		model.connect_api(self)
+		return model
+	
+	def build_stream_entity(self, line, entities = STREAM_ENTITIES, options = None):
+		entity = self.parse_stream_entity(line, entities, options)
+		if entity is None:
+			return None
+		if self.json_in_models:
+			attach_json(entity, line, None)
+		entity.connect_api(self)
+		return entity
+	
+	def process_stream(self, resp, processor, delimited = None):
+		# Returns True if the processor stopped the stream and False if the stream ended
+		if getattr(processor, 'parse_processes', 0):
+			return self.process_stream_parallel(resp, processor, delimited = delimited)
+		try:
+			entities = getattr(processor, 'entities', STREAM_ENTITIES)
+			options = self.get_model_options(processor)
+			for line in iter_messages(resp, delimited = delimited):
+				entity = self.build_stream_entity(line, entities, options)
+				if entity is not None and processor.process_entity(entity) == False:
+					return True
+			return False
+		finally:
+			resp.close()
+	
+	def process_stream_parallel(self, resp, processor, delimited = None):
+		# Decodes the messages and builds the entities in a pool of processes while the processor handles them here
+		entities = getattr(processor, 'entities', STREAM_ENTITIES)
+		options = self.get_model_options(processor)
+		if options.users is not None:
+			# The processes can't share the user map, so the models are built without one
+			warnings.warn("The processor's user_map isn't used with parse_processes", RuntimeWarning)
+			options = options.with_users(None)
+		processes = processor.parse_processes
+		reader = StreamReader(resp, delimited = delimited, batch_size = getattr(processor, 'parse_batch_size', PARSE_BATCH_SIZE), max_batches = processes * 2)
+		pool = multiprocessing.Pool(processes, init_parse_process, (entities, options, self.json_in_models))
+		try:
+			reader.start()
+			if getattr(processor, 'parse_ordered', True):
+				results = pool.imap(parse_stream_batch, reader.batches())
+			else:
+				results = pool.imap_unordered(parse_stream_batch, reader.batches())
+			while True:
+				try:
+					# Waiting with a timeout keeps the main thread interruptible
+					batch = results.next(1)
+				except multiprocessing.TimeoutError:
+					continue
+				except StopIteration:
+					break
+				reader.finish_batch()
+				for entity in batch:
+					entity.connect_api(self)
+					if processor.process_entity(entity) == False:
+						return True
+			reader.check()
+			return False
+		finally:
+			reader.stop()
+			resp.close()
+			pool.terminate()
+	
+	def run_stream(self, endpoint, url, get, post, files, processor, delimited = None):
+		# Keeps the stream connected until the processor stops it, reconnecting after errors, disconnects and stalls
+		backoff = StreamBackoff()
+		timeout = (self.pool.connect_timeout, getattr(processor, 'stall_timeout', STREAM_STALL_TIMEOUT))
+		while True:
+			try:
+				resp = self.do_request(endpoint.method, url, get = get, post = post, files = files, stream = True, endpoint = endpoint, timeout = timeout)
+			except APIError as err:
+				if backoff.is_fatal(err.status):
+					raise
+				error = err
+				delay = backoff.get_delay(err.status)
+			except NETWORK_ERRORS as err:
+				error = err
+				delay = backoff.get_delay()
+			else:
+				backoff.reset()
+				try:
+					if self.process_stream(resp, processor, delimited = delimited):
+						return
+					error = None
+				except NETWORK_ERRORS as err:
+					# A stall shows up as a read timeout
+					error = err
+				delay = backoff.get_delay()
+			if processor.on_reconnect(error, delay) == False:
+				return
+			time.sleep(delay)
+	
+	def api_call(self, endpoint, *args, **kwargs):
+		if not isinstance(endpoint, Endpoint):
+			endpoint = get_endpoint(endpoint)
+		if endpoint.stream:
+			processor = kwargs.pop('processor', None) or StreamProcessor(self)
+			reconnect = kwargs.pop('reconnect', False)
 		
-		if data['url_params'] != []:
-			endpoint = data['endpoint'] % tuple(url_params)
-		else:
-			endpoint = data['endpoint']
+		url, kwargs, files = self.prepare_call(endpoint, args, kwargs)
 		
-		if data['post']:
+		if endpoint.name == 'update_status_with_media':
+			# This is a 2-step process and different from the rest of the API calls, so we need to handle it differently
+			# First we upload all the media files and gather the assigned IDs, then we can continue with a normal status update
+			kwargs['media_ids'] = self.upload_media(kwargs.pop('media'))
+		
+		if endpoint.post:
 			get_data = None
 			post_data = kwargs
 		else:
 			get_data = kwargs
 			post_data = None
 		
-		if 'host' in data:
-			url = self.build_request_url(self.root, endpoint, host = data['host'])
-		else:
-			url = self.build_request_url(self.root, endpoint)
-		
-		resp = self.do_request("POST" if data['post'] else "GET", url, get = get_data, post = post_data, files = files, stream = stream)
-		if stream:
-			for line in resp.iter_lines(chunk_size = 1):
-				if not line:
-					continue
-				entity = self.parse_stream_entity(line)
-				entity.connect_api(self)
-				if processor.process_entity(entity) == False:
-					break
+		if endpoint.stream and reconnect:
+			self.run_stream(endpoint, url, get_data, post_data, files, processor, delimited = kwargs.get('delimited'))
+		elif endpoint.stream:
+			resp = self.do_request(endpoint.method, url, get = get_data, post = post_data, files = files, stream = True, endpoint = endpoint)
+			self.process_stream(resp, processor, delimited = kwargs.get('delimited'))
 		else:
-			if data['model'] is None:
-				return resp
+			# Cached responses are kept as JSON, since models share lists with the data they are built from
+			cache_key = self.cache.get_key(self, endpoint, url, get_data) if self.cache is not None else None
+			raw = self.cache.get(cache_key) if cache_key is not None else None
+			if raw is None and (cache_key is not None or self.json_in_models and endpoint.model is not None):
+				raw = self.do_request(endpoint.method, url, get = get_data, post = post_data, files = files, is_json = False, endpoint = endpoint)
+				if cache_key is not None:
+					self.cache.set(cache_key, endpoint, raw)
+			if raw is not None:
+				try:
+					resp = json.loads(raw)
+				except ValueError:
+					resp = raw
 			else:
-				model = data['model'].from_json(resp)
-				model.connect_api(self)
-				return model
+				resp = self.do_request(endpoint.method, url, get = get_data, post = post_data, files = files, endpoint = endpoint)
+			if endpoint.post and self.cache is not None:
+				self.cache.invalidate(endpoint)
+			return self.build_model(endpoint, resp, raw if self.json_in_models else None)
+
+def endpoint_method(endpoint):
+	def method(self, *args, **kwargs):
+		return self.api_call(endpoint, *args, **kwargs)
+	method.__name__ = endpoint.name
+	return method
+
+for endpoint in COMPILED_ENDPOINTS.itervalues():
+	setattr(API, endpoint.name, endpoint_method(endpoint))
+del endpoint
 
 class StreamProcessor:
+	entities = STREAM_ENTITIES
+	stall_timeout = STREAM_STALL_TIMEOUT
+	# Set this to a UserMap to let the entities of the stream share their users
+	user_map = None
+	# Set this to a number of processes to decode the messages and build the entities in, for streams
+	# too busy for one process. The entities are handled in the order of the stream unless parse_ordered is False.
+	parse_processes = 0
+	parse_ordered = True
+	parse_batch_size = PARSE_BATCH_SIZE
+	
 	def __init__(self, api):
 		self.api = api
 	
 	def process_entity(self, entity):
-		t = type(entity)
-		if t == Status:
-			return self.on_status(entity)
-		elif t == Message:
-			return self.on_message(entity)
-		elif t == Event:
-			return self.on_event(entity)
-		elif t == DeletionEvent:
-			return self.on_delete(entity)
-		elif t == LocationDeletionEvent:
-			return self.on_geo_delete(entity)
-		elif t == LimitEvent:
-			return self.on_limit(entity)
-		elif t == WithheldStatusEvent:
-			return self.on_withheld_status(entity)
-		elif t == WithheldUserEvent:
-			return self.on_withheld_user(entity)
-		elif t == DisconnectEvent:
-			return self.on_disconnect(entity)
-		elif t == IDCollection:
-			return self.on_friends(entity)
-		else:
+		handler = self.entities.get_handler(entity)
+		if handler is None:
 			return self.on_unknown_entity(entity)
-		return True
+		if not isinstance(handler, basestring):
+			return handler(entity)
+		return getattr(self, handler, self.on_unknown_entity)(entity)
 	
 	def on_status(self, status):
 		return True
@@ -477,46 +668,171 @@ class StreamProcessor:
 	def on_disconnect(self, event):
 		return True
 	
+	def on_warning(self, event):
+		return True
+	
 	def on_friends(self, friends):
 		return True
 	
+	def on_for_user(self, message):
+		# Site stream messages; message.for_user is the ID of the user and message.message the wrapped entity
+		return True
+	
 	def on_unknown_entity(self, entity):
 		return True
+	
+	def on_reconnect(self, error, delay):
+		# Called before reconnecting with the exception that ended the connection (None if the stream just ended)
+		# and the number of seconds until the next attempt; return False to stop instead
+		return True
+
+# What BufferedStreamProcessor does with new entities when its queue is full
+OVERFLOW_POLICIES = ('block', 'drop_oldest', 'drop_newest', 'spill')
 
 class BufferedStreamProcessor(StreamProcessor):
-	def __init__(self, api, max_items = 25):
+	# Hands the entities of the stream to worker threads, which call the on_... methods, through a queue of up to max_items entities.
+	# overflow decides what happens when the queue is full: 'block' stops reading the stream until there is space again,
+	# 'drop_oldest' and 'drop_newest' drop entities and 'spill' pickles them to a temporary file in spill_dir,
+	# from which they are taken in order once there is space again.
+	def __init__(self, api, max_items = 25, workers = 1, overflow = 'block', spill_dir = None):
 		StreamProcessor.__init__(self, api)
-		self.buffer = []
+		if overflow not in OVERFLOW_POLICIES:
+			raise ParameterError("Unknown overflow policy: %s" % overflow)
 		self.max_items = max_items
-		self.source_running = True
-		self.buffer_running = True
-		self.buffer_processor = Thread(target = self.process_buffer)
-		self.buffer_processor.start()
+		self.overflow = overflow
+		self.spill_dir = spill_dir
+		self.items = deque()
+		self.lock = threading.Lock()
+		self.not_empty = threading.Condition(self.lock)
+		self.not_full = threading.Condition(self.lock)
+		# The spill file, the positions to write the next and read the oldest entity at and the number of entities in it
+		self.spill_file = None
+		self.spill_write_pos = 0
+		self.spill_read_pos = 0
+		self.spill_depth = 0
+		self.received = 0
+		self.processed = 0
+		self.dropped = 0
+		self.spilled = 0
+		self.stopped = False
+		self.closed = False
+		self.error = None
+		self.workers = []
+		for i in range(workers):
+			worker = Thread(target = self.process_buffer)
+			worker.daemon = True
+			worker.start()
+			self.workers.append(worker)
+	
+	@property
+	def queue_depth(self):
+		return len(self.items)
+	
+	@property
+	def stats(self):
+		return {'queue_depth': self.queue_depth, 'spill_depth': self.spill_depth, 'received': self.received, 'processed': self.processed, 'dropped': self.dropped, 'spilled': self.spilled}
+	
+	def is_full(self):
+		return self.max_items and len(self.items) >= self.max_items
 	
 	def process_entity(self, entity):
-		if not self.source_running:
-			while self.buffer_running:
-				time.sleep(0.1)
-			return False
-		if not self.max_items or (self.max_items and len(self.buffer) < self.max_items):
-			self.buffer.append(entity)
-		elif self.max_items and len(self.buffer) >= self.max_items:
-			self.source_running = False
+		with self.lock:
+			if self.stopped:
+				return False
+			self.received += 1
+			# Once entities have been spilled, new ones have to wait behind them
+			if self.spill_depth or self.is_full():
+				if self.overflow == 'block':
+					while self.is_full() and not self.stopped:
+						self.not_full.wait()
+					if self.stopped:
+						return False
+				elif self.overflow == 'drop_newest':
+					self.dropped += 1
+					return True
+				elif self.overflow == 'drop_oldest':
+					self.items.popleft()
+					self.dropped += 1
+				else:
+					self.spill(entity)
+					return True
+			self.items.append(entity)
+			self.not_empty.notify()
 		return True
 	
+	def spill(self, entity):
+		if self.spill_file is None:
+			self.spill_file = tempfile.TemporaryFile(dir = self.spill_dir)
+		self.spill_file.seek(self.spill_write_pos)
+		pickle.dump(entity, self.spill_file, pickle.HIGHEST_PROTOCOL)
+		self.spill_write_pos = self.spill_file.tell()
+		self.spill_depth += 1
+		self.spilled += 1
+	
+	def unspill(self):
+		# Moves spilled entities back into the queue as long as there is space
+		while self.spill_depth and not self.is_full():
+			self.spill_file.seek(self.spill_read_pos)
+			entity = pickle.load(self.spill_file)
+			entity.connect_api(self.api)
+			self.items.append(entity)
+			self.spill_read_pos = self.spill_file.tell()
+			self.spill_depth -= 1
+		if not self.spill_depth and self.spill_file is not None:
+			# Start over at the beginning of the file, so that it doesn't grow forever
+			self.spill_file.seek(0)
+			self.spill_file.truncate()
+			self.spill_write_pos = self.spill_read_pos = 0
+	
+	def get_entity(self):
+		# Returns the next entity or None if the worker should stop
+		with self.lock:
+			while not self.items and not self.stopped and not (self.closed and not self.spill_depth):
+				self.not_empty.wait()
+			if self.stopped or not self.items:
+				return None
+			entity = self.items.popleft()
+			if self.spill_depth:
+				self.unspill()
+			self.not_full.notify()
+			return entity
+	
 	def process_buffer(self):
-		while self.buffer_running:
-			if not self.buffer:
-				if self.source_running:
-					time.sleep(0.1)
-				else:
-					self.buffer_running = False
-				continue
-			entity = self.buffer.pop(0)
-			result = StreamProcessor.process_entity(self, entity)
-			if not result:
-				self.source_running = False
-			time.sleep(1)
+		while True:
+			entity = self.get_entity()
+			if entity is None:
+				return
+			try:
+				result = StreamProcessor.process_entity(self, entity)
+			except Exception:
+				self.error = sys.exc_info()
+				result = False
+			with self.lock:
+				self.processed += 1
+			if result == False:
+				self.stop()
+	
+	def stop(self):
+		# Stops the stream and the workers, dropping the entities that haven't been processed yet
+		with self.lock:
+			self.stopped = True
+			self.not_empty.notify_all()
+			self.not_full.notify_all()
+	
+	def join(self):
+		# Waits until all entities received so far have been processed and stops the workers;
+		# call this after the stream has ended. Exceptions raised by the on_... methods are raised again here.
+		with self.lock:
+			self.closed = True
+			self.not_empty.notify_all()
+		for worker in self.workers:
+			worker.join()
+		if self.spill_file is not None:
+			self.spill_file.close()
+			self.spill_file = None
+		if self.error is not None:
+			error, self.error = self.error, None
+			raise error[0], error[1], error[2]
 
 if __name__ == '__main__':
 	print "Rainbow Dash ist best pony! :3"
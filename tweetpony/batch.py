@@ -0,0 +1,135 @@
+# Copyright 2013-2015 Julian Metzler
+
+"""
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+from Queue import Queue, Empty
+import threading
+from threading import Thread
+
+from error import ParameterError
+
+BATCH_WORKERS = 8
+
+class BatchCall(object):
+	def __init__(self, endpoint, *args, **kwargs):
+		self.endpoint = endpoint
+		self.args = args
+		self.kwargs = kwargs
+	
+	def __repr__(self):
+		params = [repr(arg) for arg in self.args] + ["%s = %r" % item for item in self.kwargs.iteritems()]
+		return "<BatchCall %s(%s)>" % (self.endpoint, ", ".join(params))
+
+class BatchResult(object):
+	def __init__(self, index, call, result = None, error = None):
+		self.index = index
+		self.call = call
+		self.result = result
+		self.error = error
+	
+	def __repr__(self):
+		return "<BatchResult #%i %s: %r>" % (self.index, "ok" if self.ok else "error", self.result if self.ok else self.error)
+	
+	@property
+	def ok(self):
+		return self.error is None
+	
+	def get(self):
+		if self.error is not None:
+			raise self.error
+		return self.result
+
+def make_batch_call(call):
+	# Calls can be given as BatchCall instances, endpoint names or tuples of
+	# (endpoint, kwargs), (endpoint, args) or (endpoint, args, kwargs)
+	if isinstance(call, BatchCall):
+		return call
+	if isinstance(call, basestring):
+		return BatchCall(call)
+	call = tuple(call)
+	if len(call) == 2:
+		endpoint, params = call
+		if isinstance(params, dict):
+			return BatchCall(endpoint, **params)
+		return BatchCall(endpoint, *params)
+	if len(call) == 3:
+		endpoint, args, kwargs = call
+		return BatchCall(endpoint, *args, **kwargs)
+	raise ParameterError("Invalid batch call: %r" % (call, ))
+
+def run_batch(api, calls, workers = BATCH_WORKERS, ordered = False):
+	calls = [make_batch_call(call) for call in calls]
+	tasks = Queue()
+	results = Queue()
+	stopped = threading.Event()
+	for index, call in enumerate(calls):
+		tasks.put((index, call))
+	
+	def work():
+		while not stopped.is_set():
+			try:
+				index, call = tasks.get_nowait()
+			except Empty:
+				return
+			try:
+				result = BatchResult(index, call, result = api.api_call(call.endpoint, *call.args, **call.kwargs))
+			except Exception as exc:
+				# A failing call must not abort the whole batch
+				result = BatchResult(index, call, error = exc)
+			results.put(result)
+	
+	def get_result():
+		while True:
+			try:
+				# Waiting with a timeout keeps the main thread interruptible
+				return results.get(True, 1)
+			except Empty:
+				pass
+	
+	for i in range(min(workers, len(calls))):
+		thread = Thread(target = work)
+		thread.daemon = True
+		thread.start()
+	
+	try:
+		if ordered:
+			done = {}
+			next_index = 0
+			for i in range(len(calls)):
+				result = get_result()
+				done[result.index] = result
+				while next_index in done:
+					yield done.pop(next_index)
+					next_index += 1
+		else:
+			for i in range(len(calls)):
+				yield get_result()
+	finally:
+		# Don't start any more calls if the caller stopped consuming the results
+		stopped.set()
+
+def map_call(api, endpoint, values, workers = BATCH_WORKERS, ordered = False):
+	# Every value is passed as keyword arguments if it's a dict, as positional arguments
+	# if it's a tuple and as the only positional argument otherwise
+	calls = []
+	for value in values:
+		if isinstance(value, dict):
+			calls.append(BatchCall(endpoint, **value))
+		elif isinstance(value, tuple):
+			calls.append(BatchCall(endpoint, *value))
+		else:
+			calls.append(BatchCall(endpoint, value))
+	return run_batch(api, calls, workers = workers, ordered = ordered)
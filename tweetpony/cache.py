@@ -0,0 +1,138 @@
+# Copyright 2013-2015 Julian Metzler
+
+"""
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import time
+from collections import OrderedDict
+from threading import Lock
+
+# Seconds to keep the responses of these endpoints
+CACHE_TTLS = {
+	'get_user': 300,
+	'get_status': 300,
+	'get_list': 300,
+	'get_place': 3600,
+	'get_suggestion_categories': 3600,
+	'trend_locations': 3600,
+	'configuration': 86400,
+	'languages': 86400,
+	'privacy_policy': 86400,
+	'terms_of_service': 86400,
+}
+
+# The families of cached responses that become outdated when calling these endpoints.
+# Other POST endpoints invalidate their own family.
+CACHE_INVALIDATIONS = {
+	'get_statuses': (),
+	'get_users': (),
+	'update_profile': ('account', 'users'),
+	'update_profile_image': ('account', 'users'),
+	'update_profile_banner': ('account', 'users'),
+	'remove_profile_banner': ('account', 'users'),
+	'update_background': ('account', 'users'),
+	'favorite': ('favorites', 'statuses'),
+	'unfavorite': ('favorites', 'statuses'),
+	'follow': ('friendships', 'friends', 'followers', 'users'),
+	'unfollow': ('friendships', 'friends', 'followers', 'users'),
+	'update_friendship': ('friendships', ),
+	'block': ('blocks', 'friendships', 'users'),
+	'unblock': ('blocks', 'friendships', 'users'),
+	'mute_user': ('mutes', 'friendships'),
+	'unmute_user': ('mutes', 'friendships'),
+	'report_spam': ('blocks', 'users'),
+	'retweet': ('statuses', 'users'),
+	'update_status': ('statuses', 'users'),
+	'update_status_with_media': ('statuses', 'users'),
+	'update_status_with_single_media': ('statuses', 'users'),
+}
+
+class ResponseCache(object):
+	# Keeps the raw responses of GET endpoints for the time given in ttls, evicting the least recently used
+	# ones when there are more than max_size. Endpoints without a TTL are cached for default_ttl seconds if it's set.
+	def __init__(self, max_size = 1024, ttls = None, default_ttl = None):
+		self.max_size = max_size
+		self.ttls = dict(CACHE_TTLS)
+		if ttls:
+			self.ttls.update(ttls)
+		self.default_ttl = default_ttl
+		self.entries = OrderedDict()
+		self.lock = Lock()
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+		self.invalidations = 0
+	
+	def __repr__(self):
+		return "<ResponseCache %i/%i entries, %i hits, %i misses>" % (len(self), self.max_size, self.hits, self.misses)
+	
+	def __len__(self):
+		return len(self.entries)
+	
+	@property
+	def stats(self):
+		return {'size': len(self), 'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions, 'invalidations': self.invalidations}
+	
+	def get_ttl(self, endpoint):
+		if endpoint.post or endpoint.stream:
+			return None
+		return self.ttls.get(endpoint.name, self.default_ttl)
+	
+	def get_key(self, api, endpoint, url, params):
+		# Returns None if the endpoint isn't cached. The parameters have already been converted to strings.
+		# The access token is part of the key since a cache may be shared by several API instances.
+		if not self.get_ttl(endpoint):
+			return None
+		return (api.access_token, url, tuple(sorted((params or {}).items())))
+	
+	def get(self, key):
+		with self.lock:
+			entry = self.entries.get(key)
+			if entry is None:
+				self.misses += 1
+				return None
+			expires, family, raw = entry
+			if expires <= time.time():
+				del self.entries[key]
+				self.misses += 1
+				return None
+			# Move the entry to the end, where the most recently used ones are
+			del self.entries[key]
+			self.entries[key] = entry
+			self.hits += 1
+			return raw
+	
+	def set(self, key, endpoint, raw):
+		with self.lock:
+			self.entries.pop(key, None)
+			self.entries[key] = (time.time() + self.get_ttl(endpoint), endpoint.family, raw)
+			while len(self.entries) > self.max_size:
+				self.entries.popitem(last = False)
+				self.evictions += 1
+	
+	def invalidate(self, endpoint):
+		# Removes the responses that may have been changed by a call to the given endpoint
+		families = CACHE_INVALIDATIONS.get(endpoint.name, (endpoint.family, ))
+		if not families:
+			return
+		with self.lock:
+			for key, (expires, family, raw) in self.entries.items():
+				if family in families:
+					del self.entries[key]
+					self.invalidations += 1
+	
+	def clear(self):
+		with self.lock:
+			self.entries.clear()
@@ -0,0 +1,149 @@
+# Copyright 2013-2015 Julian Metzler
+
+"""
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import threading
+from threading import Lock, Timer
+
+from error import *
+
+# The number of objects the lookup endpoints accept per call
+LOOKUP_BATCH_SIZE = 100
+
+# Maps the kinds of lookups to the batch endpoint, its parameter and the error Twitter returns for single lookups of missing objects
+LOOKUP_KINDS = {
+	'user_id': ('get_users', 'user_id', 50, "User not found."),
+	'screen_name': ('get_users', 'screen_name', 50, "User not found."),
+	'status': ('get_statuses', 'id', 144, "No status found with that ID."),
+}
+
+class PendingLookup(object):
+	def __init__(self):
+		self.done = threading.Event()
+		self.result = None
+		self.error = None
+	
+	def set_result(self, result):
+		self.result = result
+		self.done.set()
+	
+	def set_error(self, error):
+		self.error = error
+		self.done.set()
+	
+	def wait(self):
+		self.done.wait()
+		if self.error is not None:
+			raise self.error
+		return self.result
+
+class LookupBatch(object):
+	def __init__(self, kind, params):
+		self.kind = kind
+		self.params = params
+		# Maps the normalised IDs or screen names to the lookups waiting for them
+		self.pending = {}
+		self.timer = None
+
+def get_lookup_key(kind, value):
+	if kind == 'screen_name':
+		return value.lower()
+	return str(value)
+
+class LookupCoalescer(object):
+	# Collects the single user and status lookups of many threads for up to window seconds
+	# and makes them with one call to get_users or get_statuses
+	def __init__(self, api, window = 0.05, max_batch = LOOKUP_BATCH_SIZE):
+		self.api = api
+		self.window = window
+		self.max_batch = max_batch
+		self.batches = {}
+		self.lock = Lock()
+		self.lookups = 0
+		self.calls = 0
+	
+	def __repr__(self):
+		return "<LookupCoalescer %i lookups in %i calls>" % (self.lookups, self.calls)
+	
+	def get_user(self, user_id = None, screen_name = None, **kwargs):
+		if user_id is not None:
+			return self.lookup('user_id', user_id, kwargs)
+		if screen_name is not None:
+			return self.lookup('screen_name', screen_name, kwargs)
+		raise ParameterError("Missing required parameters: user_id or screen_name")
+	
+	def get_status(self, id, **kwargs):
+		return self.lookup('status', id, kwargs)
+	
+	def lookup(self, kind, value, params):
+		key = get_lookup_key(kind, value)
+		# Lookups with different additional parameters can't be combined. The values may be unhashable, like lists.
+		batch_key = (kind, tuple(sorted([(name, repr(value)) for name, value in params.items()])))
+		with self.lock:
+			self.lookups += 1
+			batch = self.batches.get(batch_key)
+			if batch is None:
+				batch = self.batches[batch_key] = LookupBatch(kind, params)
+				batch.timer = Timer(self.window, self.flush, (batch_key, batch))
+				batch.timer.daemon = True
+				batch.timer.start()
+			pending = batch.pending.get(key)
+			if pending is None:
+				pending = batch.pending[key] = PendingLookup()
+			full = len(batch.pending) >= self.max_batch
+			if full:
+				del self.batches[batch_key]
+		if full:
+			batch.timer.cancel()
+			self.send(batch)
+		return pending.wait()
+	
+	def flush(self, batch_key, batch):
+		with self.lock:
+			# The batch may have been sent already because it was full
+			if self.batches.get(batch_key) is not batch:
+				return
+			del self.batches[batch_key]
+		self.send(batch)
+	
+	def send(self, batch):
+		endpoint, param, error_code, error_message = LOOKUP_KINDS[batch.kind]
+		params = dict(batch.params)
+		params[param] = list(batch.pending)
+		with self.lock:
+			self.calls += 1
+		try:
+			results = self.api.api_call(endpoint, **params)
+		except APIError as err:
+			# Twitter responds with 404 if none of the objects exist
+			if err.status != 404:
+				for pending in batch.pending.values():
+					pending.set_error(err)
+				return
+			results = []
+		except Exception as err:
+			for pending in batch.pending.values():
+				pending.set_error(err)
+			return
+		found = {}
+		for item in results:
+			found[get_lookup_key(batch.kind, item['screen_name'] if batch.kind == 'screen_name' else item['id'])] = item
+		for key, pending in batch.pending.items():
+			item = found.get(key)
+			if item is None:
+				pending.set_error(APIError(code = error_code, description = error_message, status = 404))
+			else:
+				pending.set_result(item)
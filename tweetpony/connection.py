@@ -0,0 +1,54 @@
+# Copyright 2013-2015 Julian Metzler
+
+"""
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import cookielib
+
+try:
+	import requests
+	from requests.adapters import HTTPAdapter
+except ImportError:
+	raise ImportError("It seems like you don't have the 'requests' module installed which is required for TweetPony to work. Please install it first.")
+
+class ConnectionPool(object):
+	# pool_connections is the number of hosts to keep connections for,
+	# pool_maxsize is the number of connections kept open per host
+	def __init__(self, pool_connections = 10, pool_maxsize = 10, pool_block = False, connect_timeout = None, read_timeout = None):
+		self.pool_connections = pool_connections
+		self.pool_maxsize = pool_maxsize
+		self.pool_block = pool_block
+		self.connect_timeout = connect_timeout
+		self.read_timeout = read_timeout
+		self.session = requests.Session()
+		# The pool may be shared by the API instances of several users, which mustn't share cookies
+		self.session.cookies.set_policy(cookielib.DefaultCookiePolicy(allowed_domains = []))
+		adapter = HTTPAdapter(pool_connections = pool_connections, pool_maxsize = pool_maxsize, pool_block = pool_block)
+		self.session.mount("https://", adapter)
+		self.session.mount("http://", adapter)
+	
+	@property
+	def timeout(self):
+		if self.connect_timeout is None and self.read_timeout is None:
+			return None
+		return (self.connect_timeout, self.read_timeout)
+	
+	def request(self, method, url, timeout = None, **kwargs):
+		if timeout is None:
+			timeout = self.timeout
+		return self.session.request(method, url, timeout = timeout, **kwargs)
+	
+	def close(self):
+		self.session.close()
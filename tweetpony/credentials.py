@@ -0,0 +1,151 @@
+# Copyright 2013-2015 Julian Metzler
+
+"""
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import copy
+import time
+from functools import partial
+from threading import Condition
+
+from api import API
+from batch import BATCH_WORKERS, run_batch, map_call
+from coalesce import LOOKUP_BATCH_SIZE, LookupCoalescer
+from connection import ConnectionPool
+from endpoints import *
+from error import *
+from ids import collect_ids
+from paging import Cursor, Timeline
+
+class CredentialPool(object):
+	# Spreads calls over the API instances of several access tokens. Every call uses the token with the most calls
+	# left in the current rate limit window of the endpoint, tokens whose limits aren't known yet are tried first.
+	# All instances share one connection pool; other keyword arguments are passed on to them.
+	def __init__(self, consumer_key, consumer_secret, tokens, app_auth = False, wait_on_rate_limit = False, pool = None, **kwargs):
+		self.pool = pool or ConnectionPool()
+		self.wait_on_rate_limit = wait_on_rate_limit
+		kwargs['load_user'] = False
+		retry_policy = kwargs.get('retry_policy')
+		if retry_policy is not None and 429 in retry_policy.statuses:
+			# A rate limited token mustn't wait for its next window when another one can make the call
+			retry_policy = copy.copy(retry_policy)
+			retry_policy.statuses = retry_policy.statuses - frozenset([429])
+			kwargs['retry_policy'] = retry_policy
+		self.apis = [API(consumer_key, consumer_secret, access_token, access_token_secret, pool = self.pool, **kwargs) for access_token, access_token_secret in tokens]
+		if app_auth:
+			# The application's own rate limits can be used as well
+			self.apis.append(API(consumer_key, consumer_secret, pool = self.pool, app_auth = True, **kwargs))
+		if not self.apis:
+			raise ParameterError("No credentials given")
+		self.condition = Condition()
+		# The number of running calls per API instance and resource, which aren't reflected in the rate limits yet
+		self.running = {}
+		self.next_index = 0
+		self.calls = 0
+	
+	def __repr__(self):
+		return "<CredentialPool %i credentials, %i calls>" % (len(self.apis), self.calls)
+	
+	def __len__(self):
+		return len(self.apis)
+	
+	def __getattr__(self, attr):
+		if attr.startswith("__"):
+			return object.__getattr__(self, attr)
+		return partial(self.api_call, attr)
+	
+	def acquire(self, endpoint):
+		# Returns the API instance to use and 0 or None and the number of seconds until a token can be used again
+		if not endpoint.app_auth and not [api for api in self.apis if not api.app_auth]:
+			raise ParameterError("The endpoint '%s' needs user credentials" % endpoint.name)
+		with self.condition:
+			while True:
+				best = None
+				best_available = 0
+				count = len(self.apis)
+				for offset in range(count):
+					# Start at a different instance every time so that tokens with the same number of calls left take turns
+					api = self.apis[(self.next_index + offset) % count]
+					if api.app_auth and not endpoint.app_auth:
+						continue
+					rate_limit = api.rate_limits.get(endpoint)
+					if rate_limit is None:
+						available = float("inf")
+					else:
+						available = rate_limit.available - self.running.get((api, endpoint.resource), 0)
+					if available > best_available:
+						best = api
+						best_available = available
+				if best is not None:
+					break
+				if not [key for key in self.running if key[1] == endpoint.resource]:
+					return (None, min([api.rate_limits.wait_time(endpoint) for api in self.apis if endpoint.app_auth or not api.app_auth]))
+				# The calls that are left are taken by running calls, which may fail or tell us about a new window
+				self.condition.wait()
+			self.next_index = (self.next_index + 1) % count
+			key = (best, endpoint.resource)
+			self.running[key] = self.running.get(key, 0) + 1
+			self.calls += 1
+			return (best, 0)
+	
+	def release(self, api, endpoint):
+		with self.condition:
+			key = (api, endpoint.resource)
+			self.running[key] -= 1
+			if not self.running[key]:
+				del self.running[key]
+			self.condition.notify_all()
+	
+	def api_call(self, endpoint, *args, **kwargs):
+		if not isinstance(endpoint, Endpoint):
+			endpoint = get_endpoint(endpoint)
+		while True:
+			api, seconds = self.acquire(endpoint)
+			if api is None:
+				if not self.wait_on_rate_limit:
+					raise APIError(code = 88, description = "Rate limit exceeded for all credentials", status = 429)
+				time.sleep(seconds)
+				continue
+			try:
+				return api.api_call(endpoint, *args, **kwargs)
+			except APIError as err:
+				# Try another token, unless Twitter didn't tell us when this one can be used again
+				rate_limit = api.rate_limits.get(endpoint)
+				if err.status != 429 or rate_limit is None or not rate_limit.exhausted:
+					raise
+			finally:
+				self.release(api, endpoint)
+	
+	def update_rate_limits(self, resources = None):
+		for api in self.apis:
+			api.update_rate_limits(resources)
+	
+	def batch(self, calls, workers = BATCH_WORKERS, ordered = False):
+		return run_batch(self, calls, workers = workers, ordered = ordered)
+	
+	def map_call(self, endpoint, values, workers = BATCH_WORKERS, ordered = False):
+		return map_call(self, endpoint, values, workers = workers, ordered = ordered)
+	
+	def coalescer(self, window = 0.05, max_batch = LOOKUP_BATCH_SIZE):
+		return LookupCoalescer(self, window = window, max_batch = max_batch)
+	
+	def cursor(self, endpoint, **kwargs):
+		return Cursor(self, endpoint, **kwargs)
+	
+	def timeline(self, endpoint, **kwargs):
+		return Timeline(self, endpoint, **kwargs)
+	
+	def collect_ids(self, endpoint, limit = None, **kwargs):
+		return collect_ids(self, endpoint, limit = limit, **kwargs)
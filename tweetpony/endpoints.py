@@ -379,6 +379,7 @@ ENDPOINTS = {
 		'required_params': [],
 		'optional_params': ['user_id', 'screen_name', 'include_entities'],
 		'model': User,
+		'resource': "/users/show/:id",
 	},
 	'search_users': {
 		'endpoint': "users/search.json",
@@ -555,6 +556,7 @@ ENDPOINTS = {
 		'required_params': [],
 		'optional_params': ['list_id', 'slug', 'user_id', 'screen_name', 'owner_screen_name', 'owner_id', 'include_entities', 'skip_status'],
 		'model': User,
+		'resource': "/lists/members/show",
 	},
 	'list_members': {
 		'endpoint': "lists/members.json",
@@ -797,7 +799,7 @@ STREAM_ENDPOINTS = {
 		'post': True,
 		'url_params': [],
 		'required_params': [],
-		'optional_params': ['follow', 'track', 'locations', 'stall_warnings', 'language', 'filter_level'],
+		'optional_params': ['follow', 'track', 'locations', 'stall_warnings', 'language', 'filter_level', 'delimited'],
 	},
 	'sample_stream': {
 		'endpoint': "statuses/sample.json",
@@ -805,7 +807,7 @@ STREAM_ENDPOINTS = {
 		'post': False,
 		'url_params': [],
 		'required_params': [],
-		'optional_params': ['stall_warnings', 'language', 'filter_level'],
+		'optional_params': ['stall_warnings', 'language', 'filter_level', 'delimited'],
 	},
 	'firehose_stream': {
 		'endpoint': "statuses/firehose.json",
@@ -813,7 +815,7 @@ STREAM_ENDPOINTS = {
 		'post': False,
 		'url_params': [],
 		'required_params': [],
-		'optional_params': ['count', 'stall_warnings', 'language', 'filter_level'],
+		'optional_params': ['count', 'stall_warnings', 'language', 'filter_level', 'delimited'],
 	},
 	'user_stream': {
 		'endpoint': "user.json",
@@ -821,7 +823,7 @@ STREAM_ENDPOINTS = {
 		'post': False,
 		'url_params': [],
 		'required_params': [],
-		'optional_params': ['stall_warnings', 'with', 'replies', 'track', 'locations', 'language'],
+		'optional_params': ['stall_warnings', 'with', 'replies', 'track', 'locations', 'language', 'delimited'],
 	},
 	'site_stream': {
 		'endpoint': "site.json",
@@ -829,6 +831,101 @@ STREAM_ENDPOINTS = {
 		'post': False,
 		'url_params': [],
 		'required_params': [],
-		'optional_params': ['follow', 'stall_warnings', 'with', 'replies'],
+		'optional_params': ['follow', 'stall_warnings', 'with', 'replies', 'delimited'],
 	},
 }
+
+# The resources Twitter lets applications use with app-only authentication, all others need a user context
+APP_AUTH_RESOURCES = frozenset([
+	"/application/rate_limit_status",
+	"/favorites/list",
+	"/followers/ids",
+	"/followers/list",
+	"/friends/ids",
+	"/friends/list",
+	"/friendships/show",
+	"/geo/id/:place_id",
+	"/help/configuration",
+	"/help/languages",
+	"/help/privacy",
+	"/help/tos",
+	"/lists/list",
+	"/lists/members",
+	"/lists/members/show",
+	"/lists/memberships",
+	"/lists/ownerships",
+	"/lists/show",
+	"/lists/statuses",
+	"/lists/subscribers",
+	"/lists/subscribers/show",
+	"/lists/subscriptions",
+	"/search/tweets",
+	"/statuses/lookup",
+	"/statuses/oembed",
+	"/statuses/retweeters/ids",
+	"/statuses/retweets/:id",
+	"/statuses/show/:id",
+	"/statuses/user_timeline",
+	"/trends/available",
+	"/trends/closest",
+	"/trends/place",
+	"/users/lookup",
+	"/users/show/:id",
+	"/users/suggestions",
+	"/users/suggestions/:slug",
+	"/users/suggestions/:slug/members",
+])
+
+class Endpoint(object):
+	def __init__(self, name, data, stream = False):
+		self.name = name
+		self.endpoint = data['endpoint']
+		self.host = data.get('host')
+		self.post = data['post']
+		self.method = "POST" if self.post else "GET"
+		self.stream = stream
+		self.model = data.get('model')
+		self.url_params = tuple(data['url_params'])
+		self.required_params = tuple(data['required_params'])
+		self.optional_params = tuple(data['optional_params'])
+		# Positional arguments map to URL parameters first, then required and optional parameters
+		self.positional_params = self.url_params + self.required_params + self.optional_params
+		self.params = frozenset(self.positional_params)
+		# The resource name Twitter uses for rate limiting, like /statuses/show/:id, which is derived
+		# from the path unless the endpoint gives it because Twitter names it differently
+		self.resource = data.get('resource')
+		if self.resource is None:
+			path = self.endpoint % tuple([":%s" % param for param in self.url_params])
+			if path.endswith(".json"):
+				path = path[:-5]
+			self.resource = "/" + path
+		self.family = self.resource.split("/")[1]
+		self.app_auth = data.get('app_auth', self.resource in APP_AUTH_RESOURCES)
+	
+	def __repr__(self):
+		return "<Endpoint '%s'>" % self.name
+
+def compile_endpoints():
+	compiled = {}
+	for name, data in ENDPOINTS.iteritems():
+		compiled[name] = Endpoint(name, data)
+	for name, data in STREAM_ENDPOINTS.iteritems():
+		compiled[name] = Endpoint(name, data, stream = True)
+	return compiled
+
+COMPILED_ENDPOINTS = compile_endpoints()
+
+def get_endpoint(name):
+	try:
+		return COMPILED_ENDPOINTS[name]
+	except KeyError:
+		pass
+	# The endpoint tables may have been extended at runtime
+	if name in ENDPOINTS:
+		endpoint = Endpoint(name, ENDPOINTS[name])
+	elif name in STREAM_ENDPOINTS:
+		endpoint = Endpoint(name, STREAM_ENDPOINTS[name], stream = True)
+	else:
+		raise NotImplementedError("API endpoint for method '%s' not found." % name)
+	COMPILED_ENDPOINTS[name] = endpoint
+	return endpoint
@@ -16,10 +16,12 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
 class APIError(Exception):
-	def __init__(self, description, code = None, body = None):
+	def __init__(self, description, code = None, body = None, status = None):
 		self.code = code
 		self.description = description
 		self.body = body
+		# The HTTP status code of the response
+		self.status = status
 	
 	def __str__(self):
 		if self.code is None:
@@ -0,0 +1,193 @@
+# Copyright 2013-2015 Julian Metzler
+
+"""
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import struct
+import sys
+from array import array
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+from paging import Cursor
+
+# The array type code of 64 bit signed integers: 'q' isn't available before Python 3.3, but 'l' is 64 bits wide on most 64 bit systems
+ID_TYPECODE = None
+for _typecode in ('q', 'l'):
+	try:
+		if array(_typecode).itemsize == 8:
+			ID_TYPECODE = _typecode
+			break
+	except ValueError:
+		pass
+
+# Files written by IDArray.save start with this, followed by the number of IDs and the IDs as little endian 64 bit integers
+ID_FILE_MAGIC = b"TPIDS\x01"
+ID_FILE_HEADER = struct.Struct("<6sQ")
+ID_FILE_CHUNK_SIZE = 65536
+
+class IDArray(array):
+	# A compact collection of user or status IDs, using 8 bytes per ID instead of about 32 for a list of ints.
+	# The set operations return sorted IDArrays without duplicates and use NumPy if it's installed.
+	def __new__(cls, ids = ()):
+		if ID_TYPECODE is None:
+			raise TypeError("IDArray requires 64 bit integer arrays, which aren't available on this platform")
+		self = array.__new__(cls, ID_TYPECODE)
+		self.add_page(ids)
+		return self
+	
+	def __repr__(self):
+		return "<IDArray %i IDs>" % len(self)
+	
+	def __reduce__(self):
+		return (self.__class__, (self.tolist(), ))
+	
+	@classmethod
+	def from_json(cls, data, options = None):
+		return cls(data)
+	
+	@classmethod
+	def from_bytes(cls, data):
+		self = cls()
+		if hasattr(self, 'frombytes'):
+			self.frombytes(data)
+		else:
+			self.fromstring(data)
+		return self
+	
+	def connect_api(self, api):
+		pass
+	
+	def add_page(self, ids):
+		# Appends the IDs of a page like the one returned by followers_ids, which may be strings if stringify_ids was used
+		if isinstance(ids, array) and ids.typecode == self.typecode:
+			self.extend(ids)
+			return
+		ids = list(ids)
+		if ids and not isinstance(ids[0], (int, long)):
+			ids = [int(id) for id in ids]
+		self.extend(ids)
+	
+	def to_bytes(self):
+		if hasattr(self, 'tobytes'):
+			return self.tobytes()
+		return self.tostring()
+	
+	def as_numpy(self):
+		# Returns a NumPy view of the IDs without copying them
+		return numpy.frombuffer(self, dtype = numpy.int64) if len(self) else numpy.zeros(0, dtype = numpy.int64)
+	
+	@classmethod
+	def from_numpy(cls, ids):
+		return cls.from_bytes(numpy.ascontiguousarray(ids, dtype = numpy.int64).tobytes())
+	
+	def unique(self):
+		# Returns the IDs sorted and without duplicates
+		if numpy is not None:
+			return self.from_numpy(numpy.unique(self.as_numpy()))
+		return self.__class__(sorted(set(self)))
+	
+	def get_ids(self, other):
+		if isinstance(other, IDArray):
+			return other.as_numpy()
+		return numpy.fromiter((int(id) for id in other), dtype = numpy.int64)
+	
+	def intersection(self, other):
+		if numpy is not None:
+			return self.from_numpy(numpy.intersect1d(self.as_numpy(), self.get_ids(other)))
+		# Only hash the smaller collection
+		if len(self) <= len(other):
+			ids = set(self).intersection(other)
+		else:
+			ids = set(other).intersection(self)
+		return self.__class__(sorted(ids))
+	
+	def difference(self, other):
+		if numpy is not None:
+			return self.from_numpy(numpy.setdiff1d(self.as_numpy(), self.get_ids(other)))
+		ids = set(self)
+		ids.difference_update(other)
+		return self.__class__(sorted(ids))
+	
+	def union(self, other):
+		if numpy is not None:
+			return self.from_numpy(numpy.union1d(self.as_numpy(), self.get_ids(other)))
+		ids = set(self)
+		ids.update(other)
+		return self.__class__(sorted(ids))
+	
+	def symmetric_difference(self, other):
+		if numpy is not None:
+			return self.from_numpy(numpy.setxor1d(self.as_numpy(), self.get_ids(other)))
+		ids = set(self)
+		ids.symmetric_difference_update(other)
+		return self.__class__(sorted(ids))
+	
+	__and__ = intersection
+	__or__ = union
+	__xor__ = symmetric_difference
+	__sub__ = difference
+	
+	def save(self, file):
+		# Writes the IDs to a file name or an open binary file
+		if not hasattr(file, 'write'):
+			with open(file, 'wb') as f:
+				return self.save(f)
+		file.write(ID_FILE_HEADER.pack(ID_FILE_MAGIC, len(self)))
+		# Write in chunks to avoid copying all IDs at once
+		for start in range(0, len(self), ID_FILE_CHUNK_SIZE):
+			chunk = array(self.typecode, self[start:start + ID_FILE_CHUNK_SIZE])
+			if sys.byteorder != 'little':
+				chunk.byteswap()
+			file.write(chunk.tobytes() if hasattr(chunk, 'tobytes') else chunk.tostring())
+	
+	@classmethod
+	def load(cls, file):
+		# Reads IDs written by save from a file name or an open binary file
+		if not hasattr(file, 'read'):
+			with open(file, 'rb') as f:
+				return cls.load(f)
+		header = file.read(ID_FILE_HEADER.size)
+		if len(header) != ID_FILE_HEADER.size or not header.startswith(ID_FILE_MAGIC):
+			raise ValueError("Not an ID file")
+		magic, count = ID_FILE_HEADER.unpack(header)
+		self = cls()
+		while len(self) < count:
+			size = min(count - len(self), ID_FILE_CHUNK_SIZE) * self.itemsize
+			data = file.read(size)
+			if len(data) != size:
+				raise ValueError("The ID file is truncated")
+			chunk = cls.from_bytes(data)
+			if sys.byteorder != 'little':
+				chunk.byteswap()
+			self.extend(chunk)
+		return self
+
+def collect_ids(api, endpoint, limit = None, **kwargs):
+	# Loads all pages of a cursored ID endpoint like followers_ids into one IDArray
+	ids = IDArray()
+	pages = Cursor(api, endpoint, **kwargs).pages()
+	try:
+		for page in pages:
+			ids.add_page(page.get(page.model_key, []))
+			if limit is not None and len(ids) >= limit:
+				del ids[limit:]
+				break
+	finally:
+		pages.close()
+	return ids
@@ -17,12 +17,40 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import json
 import locale
+import time
 import utils
 
+from collections import OrderedDict
 from datetime import datetime
 from error import ParameterError
+from threading import Lock, RLock
+
+TIMESTAMP_FORMAT = '%a %b %d %H:%M:%S +0000 %Y'
+TIMESTAMP_CACHE_SIZE = 1024
+MONTHS = {'Jan': 1, 'Feb': 2, 'Mar': 3, 'Apr': 4, 'May': 5, 'Jun': 6, 'Jul': 7, 'Aug': 8, 'Sep': 9, 'Oct': 10, 'Nov': 11, 'Dec': 12}
+_timestamp_cache = {}
+
+def parse_timestamp(string):
+	# Parses timestamps like 'Wed Aug 27 13:08:45 +0000 2008' without depending on the locale
+	try:
+		return _timestamp_cache[string]
+	except KeyError:
+		pass
+	try:
+		if len(string) != 30 or string[19:26] != ' +0000 ':
+			raise ValueError
+		value = datetime(int(string[26:30]), MONTHS[string[4:7]], int(string[8:10]), int(string[11:13]), int(string[14:16]), int(string[17:19]))
+	except (KeyError, ValueError, TypeError):
+		raise ValueError("time data %r does not match format %r" % (string, TIMESTAMP_FORMAT))
+	# Timestamps repeat a lot within the same second of a stream, but don't let the cache grow forever
+	if len(_timestamp_cache) >= TIMESTAMP_CACHE_SIZE:
+		_timestamp_cache.clear()
+	_timestamp_cache[string] = value
+	return value
 
-def strptime(string, fmt = '%a %b %d %H:%M:%S +0000 %Y'):
+def strptime(string, fmt = TIMESTAMP_FORMAT):
+	if fmt == TIMESTAMP_FORMAT:
+		return parse_timestamp(string)
 	locale.setlocale(locale.LC_TIME, 'C')
 	value = datetime.strptime(string, fmt)
 	locale.setlocale(locale.LC_TIME, '')
@@ -36,30 +64,72 @@ class DummyUser:
 	def __getattr__(self, name):
 		raise NotImplementedError("This API instance does not have verified credentials and thus did not load the authenticating user's profile.")
 
+class ModelOptions(object):
+	def __init__(self, lazy = False, compact = False, users = None):
+		# Lazy models keep the decoded data as it is and convert values on first access
+		self.lazy = lazy
+		# Models with a compact variant are built as such, which takes precedence over lazy
+		self.compact = compact
+		# A UserMap to look up the users embedded in other models in
+		self.users = users
+	
+	def with_users(self, users):
+		return ModelOptions(lazy = self.lazy, compact = self.compact, users = users)
+
+DEFAULT_OPTIONS = ModelOptions()
+
+def convert_value(value):
+	t = type(value)
+	if t is dict:
+		return AttrDict(value)
+	elif t is list:
+		for i in range(len(value)):
+			if type(value[i]) == dict:
+				value[i] = AttrDict(value[i])
+			elif type(value[i]) == list:
+				for n in range(len(value[i])):
+					if type(value[i][n]) == dict:
+						value[i][n] = AttrDict(value[i][n])
+	return value
+
 class AttrDict(dict):
 	def __init__(self, data = None):
 		if data is not None:
 			for key, value in data.iteritems():
-				if type(value) == dict:
-					value = AttrDict(value)
-				elif type(value) == list:
-					for i in range(len(value)):
-						if type(value[i]) == dict:
-							value[i] = AttrDict(value[i])
-						elif type(value[i]) == list:
-							for n in range(len(value[i])):
-								if type(value[i][n]) == dict:
-									value[i][n] = AttrDict(value[i][n])
-				self[key] = value
+				self[key] = convert_value(value)
 	
 	def __getattr__(self, name):
 		try:
 			return self.__getitem__(name)
 		except KeyError:
 			raise AttributeError
+	
+	def __reduce__(self):
+		# The default protocol looks up several special methods, which are expensive to miss with __getattr__
+		return (restore_dict, (type(self), dict(self), self.__dict__ or None))
+
+def restore_dict(cls, data, state = None):
+	self = cls()
+	dict.update(self, data)
+	if state:
+		self.__dict__.update(state)
+	return self
+
+# Guards the conversion of lazy models, which may be shared between threads. It's reentrant because
+# converting a value can build nested models or look up shared users, which converts their values.
+MATERIALIZE_LOCK = RLock()
 
 class Model(AttrDict):
 	api = DummyAPI()
+	# Maps keys to functions converting their values, e.g. to nested models
+	fields = {}
+	# Keys which are converted right away even in lazy models because they add other keys
+	eager_fields = ()
+	compact_model = None
+	_options = DEFAULT_OPTIONS
+	_pending = None
+	# The key of the stream message kind the model was built for, see StreamEntityRegistry
+	_stream_key = None
 	
 	def __getattr__(self, name):
 		try:
@@ -68,24 +138,307 @@ class Model(AttrDict):
 			return AttrDict.__getattr__(self, name)
 	
 	@classmethod
-	def from_json(cls, data):
-		self = cls(data)
-		self['json'] = json.dumps(data)
+	def from_json(cls, data, options = None):
+		if options is not None and options.compact and cls.compact_model is not None:
+			return cls.compact_model.from_json(data, options)
+		self = cls()
+		dict.update(self, data)
+		if options is not None and options is not DEFAULT_OPTIONS:
+			self._options = options
+		if self._options.lazy:
+			self._pending = set(data)
+			for key in cls.eager_fields:
+				if key in self._pending:
+					self._materialize(key)
+		else:
+			for key, value in data.iteritems():
+				dict.__setitem__(self, key, self.convert(key, value))
+		return self
+	
+	def convert(self, key, value):
+		converter = self.fields.get(key)
+		if converter is not None:
+			return converter(self, value)
+		return convert_value(value)
+	
+	def _set(self, key, value):
+		dict.__setitem__(self, key, value)
+	
+	def _materialize(self, key):
+		# The key is only discarded after the converted value has been stored, so other threads
+		# either wait here or see the converted value, and no value is converted twice
+		with MATERIALIZE_LOCK:
+			if key in self._pending:
+				dict.__setitem__(self, key, self.convert(key, dict.__getitem__(self, key)))
+				self._pending.discard(key)
+	
+	def materialize(self):
+		if self._pending:
+			for key in list(self._pending):
+				self._materialize(key)
+		return self
+	
+	def __getitem__(self, key):
+		if self._pending and key in self._pending:
+			self._materialize(key)
+		return dict.__getitem__(self, key)
+	
+	def __setitem__(self, key, value):
+		if self._pending:
+			with MATERIALIZE_LOCK:
+				self._pending.discard(key)
+				dict.__setitem__(self, key, value)
+		else:
+			dict.__setitem__(self, key, value)
+	
+	def __delitem__(self, key):
+		if self._pending:
+			with MATERIALIZE_LOCK:
+				self._pending.discard(key)
+				dict.__delitem__(self, key)
+		else:
+			dict.__delitem__(self, key)
+	
+	def get(self, key, default = None):
+		if self._pending and key in self._pending:
+			self._materialize(key)
+		return dict.get(self, key, default)
+	
+	def pop(self, key, *args):
+		if self._pending and key in self._pending:
+			self._materialize(key)
+		return dict.pop(self, key, *args)
+	
+	def setdefault(self, key, default = None):
+		if self._pending and key in self._pending:
+			self._materialize(key)
+		return dict.setdefault(self, key, default)
+	
+	def items(self):
+		return dict.items(self.materialize())
+	
+	def iteritems(self):
+		return dict.iteritems(self.materialize())
+	
+	def values(self):
+		return dict.values(self.materialize())
+	
+	def itervalues(self):
+		return dict.itervalues(self.materialize())
+	
+	def copy(self):
+		return dict.copy(self.materialize())
+	
+	def __copy__(self):
+		# Unlike unpickled models, copies keep their API instance and options
+		data = dict.copy(self.materialize())
+		state = dict(self.__dict__)
+		state.pop('_pending', None)
+		return restore_dict(type(self), data, state)
+	
+	def __eq__(self, other):
+		if isinstance(other, Model):
+			other.materialize()
+		return dict.__eq__(self.materialize(), other)
+	
+	def __ne__(self, other):
+		equal = self.__eq__(other)
+		if equal is NotImplemented:
+			return equal
+		return not equal
+	
+	def __repr__(self):
+		return dict.__repr__(self.materialize())
+	
+	def __reduce__(self):
+		# The API instance and the options can't be pickled, so unpickled models use the defaults, and lazy models are converted completely
+		state = dict(self.__dict__)
+		state.pop('api', None)
+		state.pop('_options', None)
+		state.pop('_pending', None)
+		return (restore_dict, (type(self), dict.copy(self.materialize()), state or None))
+	
+	def connect_api(self, api):
+		self.api = api
+
+class CompactModel(object):
+	# Keeps the well-known keys in slots and only the others in a dict, which takes a lot less memory than Model
+	__slots__ = ('api', '_options', '_extra', '_stream_key')
+	fields = {}
+	eager_fields = ()
+	slot_names = frozenset()
+	
+	@classmethod
+	def from_json(cls, data, options = None):
+		self = cls()
+		self.api = Model.api
+		self._options = options or DEFAULT_OPTIONS
+		self._extra = None
+		self._stream_key = None
+		fields = self.fields
+		for key, value in data.iteritems():
+			converter = fields.get(key)
+			if converter is not None:
+				value = converter(self, value)
+			else:
+				value = convert_value(value)
+			self._set(key, value)
 		return self
 	
+	def _set(self, key, value):
+		if key in self.slot_names:
+			setattr(self, key, value)
+		else:
+			if self._extra is None:
+				self._extra = {}
+			self._extra[key] = value
+	
+	def __getattr__(self, name):
+		if name == '_extra' or name.startswith('__'):
+			raise AttributeError(name)
+		extra = self._extra
+		if extra is not None and name in extra:
+			return extra[name]
+		raise AttributeError(name)
+	
+	def __getitem__(self, key):
+		if key in self.slot_names:
+			try:
+				return getattr(self, key)
+			except AttributeError:
+				raise KeyError(key)
+		if self._extra is None:
+			raise KeyError(key)
+		return self._extra[key]
+	
+	def __setitem__(self, key, value):
+		self._set(key, value)
+	
+	def __delitem__(self, key):
+		if key in self.slot_names:
+			try:
+				delattr(self, key)
+			except AttributeError:
+				raise KeyError(key)
+		elif self._extra is None:
+			raise KeyError(key)
+		else:
+			del self._extra[key]
+	
+	def __contains__(self, key):
+		try:
+			self[key]
+		except KeyError:
+			return False
+		return True
+	
+	def __iter__(self):
+		return iter(self.keys())
+	
+	def __len__(self):
+		return len(self.keys())
+	
+	def __repr__(self):
+		return "%s(%r)" % (type(self).__name__, self.to_dict())
+	
+	def __eq__(self, other):
+		# Compares the keys and values like a dict-based model does
+		if isinstance(other, CompactModel):
+			other = other.to_dict()
+		elif isinstance(other, Model):
+			other = other.materialize()
+		elif not isinstance(other, dict):
+			return NotImplemented
+		return self.to_dict() == other
+	
+	def __ne__(self, other):
+		equal = self.__eq__(other)
+		if equal is NotImplemented:
+			return equal
+		return not equal
+	
+	# Like dict-based models, compact models can change and thus can't be hashed
+	__hash__ = None
+	
+	def get(self, key, default = None):
+		try:
+			return self[key]
+		except KeyError:
+			return default
+	
+	def keys(self):
+		keys = [key for key in self.slot_names if hasattr(self, key)]
+		if self._extra:
+			keys.extend(self._extra.keys())
+		return keys
+	
+	def values(self):
+		return [self[key] for key in self.keys()]
+	
+	def items(self):
+		return [(key, self[key]) for key in self.keys()]
+	
+	def to_dict(self):
+		return dict(self.items())
+	
+	def materialize(self):
+		return self
+	
+	def __getstate__(self):
+		state = {}
+		for cls in type(self).__mro__:
+			for name in getattr(cls, '__slots__', ()):
+				if name not in ('api', '_options') and hasattr(self, name):
+					state[name] = getattr(self, name)
+		return state
+	
+	def __setstate__(self, state):
+		self.api = Model.api
+		self._options = DEFAULT_OPTIONS
+		self._extra = None
+		self._stream_key = None
+		for name, value in state.items():
+			setattr(self, name, value)
+	
+	def __copy__(self):
+		copy = type(self).__new__(type(self))
+		copy.__setstate__(self.__getstate__())
+		copy.api = self.api
+		copy._options = self._options
+		if copy._extra is not None:
+			copy._extra = dict(copy._extra)
+		return copy
+	
 	def connect_api(self, api):
 		self.api = api
-		if not api.json_in_models:
-			del self['json']
+
+def attach_json(model, raw, data):
+	# The raw response is kept as it is; only the items of collections need to be encoded separately
+	if isinstance(model, ModelCollection):
+		model.json = raw
+		items = list.__iter__(model)
+	elif isinstance(model, (Model, CompactModel)):
+		model['json'] = raw
+		if not isinstance(model, MixedModelCollection) or data is None:
+			return
+		if type(data) is list and len(data) == 1:
+			data = data[0]
+		items = list.__iter__(model.get(model.model_key) or [])
+		data = data.get(model.model_key)
+	else:
+		return
+	for item, item_data in zip(items, data or []):
+		if isinstance(item, (Model, CompactModel)):
+			item['json'] = json.dumps(item_data)
 
 class ModelCollection(list):
 	model = Model
 	
 	@classmethod
-	def from_json(cls, data):
+	def from_json(cls, data, options = None):
 		self = cls()
 		for item in data:
-			self.append(self.model.from_json(item))
+			self.append(self.model.from_json(item, options))
 		return self
 	
 	def connect_api(self, api):
@@ -93,6 +446,11 @@ class ModelCollection(list):
 			if hasattr(item, 'connect_api'):
 				item.connect_api(api)
 	
+	def __getstate__(self):
+		state = dict(self.__dict__)
+		state.pop('_iterator', None)
+		return state
+	
 	def __iter__(self):
 		self._iterator = list.__iter__(self)
 		return self._iterator
@@ -105,15 +463,15 @@ class MixedModelCollection(Model):
 	collection = ModelCollection
 	
 	@classmethod
-	def from_json(cls, data):
+	def from_json(cls, data, options = None):
 		if type(data) is list and len(data) == 1:
 			data = data[0]
-		self = cls(Model.from_json(data))
-		for key, value in self.iteritems():
-			if key == self.model_key:
-				value = self.collection.from_json(value)
-			self[key] = value
-		return self
+		return super(MixedModelCollection, cls).from_json(data, options)
+	
+	def convert(self, key, value):
+		if key == self.model_key:
+			return self.collection.from_json(value, self._options)
+		return Model.convert(self, key, value)
 	
 	def connect_api(self, api):
 		for item in self.get(self.model_key, []):
@@ -138,31 +496,103 @@ class MixedModelCollection(Model):
 class CursoredModelCollection(MixedModelCollection):
 	pass
 
+def to_datetime(model, value):
+	return strptime(value)
+
+class UserMap(object):
+	# Maps user IDs to User models, so that the statuses, messages and events of the same user share one instance.
+	# Holds up to max_size users, dropping the least recently used ones. If max_age is set,
+	# users are built again from the newest data once they are older than that many seconds.
+	def __init__(self, max_size = 10000, max_age = None):
+		self.max_size = max_size
+		self.max_age = max_age
+		self.users = OrderedDict()
+		self.lock = Lock()
+		self.hits = 0
+		self.misses = 0
+	
+	def __repr__(self):
+		return "<UserMap %i/%i users, %i hits, %i misses>" % (len(self), self.max_size, self.hits, self.misses)
+	
+	def __len__(self):
+		return len(self.users)
+	
+	def get_user(self, data, options):
+		user_id = data.get('id')
+		if user_id is None:
+			return User.from_json(data, options)
+		now = time.time() if self.max_age is not None else None
+		with self.lock:
+			entry = self.users.get(user_id)
+			if entry is not None and (now is None or entry[0] > now - self.max_age):
+				del self.users[user_id]
+				self.users[user_id] = entry
+				self.hits += 1
+				return entry[1]
+			self.misses += 1
+		user = User.from_json(data, options)
+		# Don't let the users of responses with trim_user = true stand in for complete ones
+		if 'screen_name' in data:
+			with self.lock:
+				self.users.pop(user_id, None)
+				self.users[user_id] = (now, user)
+				if len(self.users) > self.max_size:
+					self.users.popitem(last = False)
+		return user
+	
+	def clear(self):
+		with self.lock:
+			self.users.clear()
+
+def to_user(model, value):
+	users = model._options.users
+	if users is not None:
+		return users.get_user(value, model._options)
+	return User.from_json(value, model._options)
+
+def to_status(model, value):
+	return Status.from_json(value, model._options)
+
 ########################################################
 
-class Status(Model):
-	@classmethod
-	def from_json(cls, data):
-		self = cls(Model.from_json(data))
-		tmp = cls()
-		for key, value in self.iteritems():
-			if key == 'created_at':
-				value = strptime(value)
-			elif key == 'user':
-				value = User.from_json(value)
-			elif key == 'text':
-				value = value.replace("&lt;", "<").replace("&gt;", ">").replace("&amp;", "&")
-			elif key == 'retweeted_status':
-				value = Status.from_json(value)
-			elif key == 'source':
-				try:
-					tmp[u'source_url'] = value.split('"')[1]
-					value = value.split(">")[1].split("<")[0]
-				except IndexError:
-					tmp[u'source_url'] = None
-			tmp[key] = value
-		self = tmp
-		return self
+STATUS_FIELDS = ('created_at', 'id', 'id_str', 'text', 'source', 'source_url', 'truncated', 'in_reply_to_status_id', 'in_reply_to_status_id_str',
+	'in_reply_to_user_id', 'in_reply_to_user_id_str', 'in_reply_to_screen_name', 'user', 'geo', 'coordinates', 'place', 'contributors',
+	'retweeted_status', 'quoted_status_id', 'quoted_status_id_str', 'quoted_status', 'is_quote_status', 'retweet_count', 'favorite_count',
+	'entities', 'extended_entities', 'favorited', 'retweeted', 'possibly_sensitive', 'filter_level', 'lang', 'timestamp_ms')
+
+USER_FIELDS = ('id', 'id_str', 'name', 'screen_name', 'location', 'description', 'url', 'entities', 'protected', 'followers_count',
+	'friends_count', 'listed_count', 'created_at', 'favourites_count', 'utc_offset', 'time_zone', 'geo_enabled', 'verified', 'statuses_count',
+	'lang', 'status', 'contributors_enabled', 'is_translator', 'is_translation_enabled', 'profile_background_color',
+	'profile_background_image_url', 'profile_background_image_url_https', 'profile_background_tile', 'profile_image_url',
+	'profile_image_url_https', 'profile_banner_url', 'profile_link_color', 'profile_sidebar_border_color', 'profile_sidebar_fill_color',
+	'profile_text_color', 'profile_use_background_image', 'default_profile', 'default_profile_image', 'following', 'follow_request_sent',
+	'notifications', 'has_extended_profile')
+
+MESSAGE_FIELDS = ('id', 'id_str', 'text', 'created_at', 'entities', 'sender', 'sender_id', 'sender_id_str', 'sender_screen_name',
+	'recipient', 'recipient_id', 'recipient_id_str', 'recipient_screen_name')
+
+class BaseStatus(object):
+	__slots__ = ()
+	
+	def convert_text(self, value):
+		return value.replace("&lt;", "<").replace("&gt;", ">").replace("&amp;", "&")
+	
+	def convert_source(self, value):
+		try:
+			self._set(u'source_url', value.split('"')[1])
+			value = value.split(">")[1].split("<")[0]
+		except IndexError:
+			self._set(u'source_url', None)
+		return value
+	
+	fields = {
+		'created_at': to_datetime,
+		'user': to_user,
+		'text': convert_text,
+		'retweeted_status': to_status,
+		'source': convert_source,
+	}
+	eager_fields = ('source', )
 	
 	def clean_text(self):
 		return self.text
@@ -189,17 +619,20 @@ class Status(Model):
 	def retweets(self, **kwargs):
 		return self.api.retweets(id = self.id, **kwargs)
 
-class User(Model):
-	@classmethod
-	def from_json(cls, data):
-		self = cls(Model.from_json(data))
-		for key, value in self.iteritems():
-			if key == 'created_at':
-				value = strptime(value)
-			elif key == 'status':
-				value = Status.from_json(value)
-			self[key] = value
-		return self
+class Status(BaseStatus, Model):
+	pass
+
+class CompactStatus(BaseStatus, CompactModel):
+	__slots__ = STATUS_FIELDS
+	slot_names = frozenset(STATUS_FIELDS)
+
+class BaseUser(object):
+	__slots__ = ()
+	
+	fields = {
+		'created_at': to_datetime,
+		'status': to_status,
+	}
 	
 	def follow(self, **kwargs):
 		return self.api.follow(user_id = self.id, **kwargs)
@@ -259,17 +692,21 @@ class User(Model):
 	def favorites(self):
 		return self.api.favorites(user_id = self.id)
 
-class Message(Model):
-	@classmethod
-	def from_json(cls, data):
-		self = cls(Model.from_json(data))
-		for key, value in self.iteritems():
-			if key == 'created_at':
-				value = strptime(value)
-			elif key == 'sender' or key == 'recipient':
-				value = User.from_json(value)
-			self[key] = value
-		return self
+class User(BaseUser, Model):
+	pass
+
+class CompactUser(BaseUser, CompactModel):
+	__slots__ = USER_FIELDS
+	slot_names = frozenset(USER_FIELDS)
+
+class BaseMessage(object):
+	__slots__ = ()
+	
+	fields = {
+		'created_at': to_datetime,
+		'sender': to_user,
+		'recipient': to_user,
+	}
 	
 	def delete(self):
 		return self.api.delete_message(id = self.id)
@@ -277,30 +714,39 @@ class Message(Model):
 	def reply(self, text):
 		return self.api.send_message(user_id = self.sender.id, text = text)
 
+class Message(BaseMessage, Model):
+	pass
+
+class CompactMessage(BaseMessage, CompactModel):
+	__slots__ = MESSAGE_FIELDS
+	slot_names = frozenset(MESSAGE_FIELDS)
+
+Status.compact_model = CompactStatus
+User.compact_model = CompactUser
+Message.compact_model = CompactMessage
+
 class OEmbed(Model):
 	pass
 
 class Relationship(Model):
 	@classmethod
-	def from_json(cls, data):
-		self = cls(Model.from_json(data['relationship']))
+	def from_json(cls, data, options = None):
+		self = super(Relationship, cls).from_json(data['relationship'], options)
 		self['following'] = self['source']['following']
 		self['followed_by'] = self['source']['followed_by']
 		return self
 
 class SimpleRelationship(Model):
-	@classmethod
-	def from_json(cls, data):
-		self = cls(Model.from_json(data))
-		tmp = cls()
-		for key, value in self.iteritems():
-			if key == 'connections':
-				tmp['followed_by'] = 'followed_by' in value
-				tmp['following'] = 'following' in value
-				tmp['following_requested'] = 'following_requested' in value
-			tmp[key] = value
-		self = tmp
-		return self
+	def convert_connections(self, value):
+		self._set('followed_by', 'followed_by' in value)
+		self._set('following', 'following' in value)
+		self._set('following_requested', 'following_requested' in value)
+		return value
+	
+	fields = {
+		'connections': convert_connections,
+	}
+	eager_fields = ('connections', )
 
 class Settings(Model):
 	pass
@@ -309,16 +755,10 @@ class Sizes(Model):
 	pass
 
 class List(Model):
-	@classmethod
-	def from_json(cls, data):
-		self = cls(Model.from_json(data))
-		for key, value in self.iteritems():
-			if key == 'created_at':
-				value = strptime(value)
-			elif key == 'user':
-				value = User.from_json(value)
-			self[key] = value
-		return self
+	fields = {
+		'created_at': to_datetime,
+		'user': to_user,
+	}
 	
 	def delete(self):
 		return self.api.delete_list(list_id = self.id)
@@ -339,14 +779,9 @@ class List(Model):
 		return self.api.batch_remove_from_list(list_id = self.id, user_id = user_id, screen_name = screen_name)
 
 class SavedSearch(Model):
-	@classmethod
-	def from_json(cls, data):
-		self = cls(Model.from_json(data))
-		for key, value in self.iteritems():
-			if key == 'created_at':
-				value = strptime(value)
-			self[key] = value
-		return self
+	fields = {
+		'created_at': to_datetime,
+	}
 	
 	def results(self, **kwargs):
 		return self.api.search_tweets(q = self.query, **kwargs)
@@ -355,27 +790,25 @@ class SavedSearch(Model):
 		return self.api.delete_saved_search(id = self.id)
 
 class Place(Model):
-	@classmethod
-	def from_json(cls, data):
-		self = cls(Model.from_json(data))
-		for key, value in self.iteritems():
-			if key == 'contained_within':
-				value = [Place.from_json(item) for item in value]
-			self[key] = value
-		return self
+	def convert_contained_within(self, value):
+		return [Place.from_json(item, self._options) for item in value]
+	
+	fields = {
+		'contained_within': convert_contained_within,
+	}
 	
 	def similar(self, lat, long, **kwargs):
 		return self.api.similar_places(lat = lat, long = long, name = self.name, **kwargs)
 
 class PlaceSearchResult(Model):
-	@classmethod
-	def from_json(cls, data):
-		self = cls(Model.from_json(data))
-		for key, value in self.iteritems():
-			if key == 'result':
-				value['places'] = PlaceCollection.from_json(value['places'])
-			self[key] = value
-		return self
+	def convert_result(self, value):
+		value = AttrDict(value)
+		value['places'] = PlaceCollection.from_json(value['places'], self._options)
+		return value
+	
+	fields = {
+		'result': convert_result,
+	}
 
 class Trend(Model):
 	pass
@@ -393,18 +826,19 @@ class RateLimitStatus(Model):
 	pass
 
 class Event(Model):
-	@classmethod
-	def from_json(cls, data):
-		self = cls(Model.from_json(data))
-		for key, value in self.iteritems():
-			if key == 'target' or key == 'source':
-				value = User.from_json(value)
-			self[key] = value
-		if 'favorite' in self['event']:
-			self['target_object'] = Status.from_json(self['target_object'])
-		elif self['event'].startswith('list_'):
-			self['target_object'] = List.from_json(self['target_object'])
-		return self
+	def convert_target_object(self, value):
+		event = self['event']
+		if 'favorite' in event:
+			return Status.from_json(value, self._options)
+		elif event.startswith('list_'):
+			return List.from_json(value, self._options)
+		return convert_value(value)
+	
+	fields = {
+		'target': to_user,
+		'source': to_user,
+		'target_object': convert_target_object,
+	}
 
 class DeletionEvent(Model):
 	pass
@@ -424,9 +858,12 @@ class WithheldUserEvent(Model):
 class DisconnectEvent(Model):
 	pass
 
+class WarningEvent(Model):
+	pass
+
 class PrivacyPolicy(str):
 	@classmethod
-	def from_json(cls, data):
+	def from_json(cls, data, options = None):
 		self = cls(data['privacy'].encode('utf-8'))
 		return self
 	
@@ -435,7 +872,7 @@ class PrivacyPolicy(str):
 
 class TermsOfService(str):
 	@classmethod
-	def from_json(cls, data):
+	def from_json(cls, data, options = None):
 		self = cls(data['tos'].encode('utf-8'))
 		return self
 	
@@ -453,7 +890,7 @@ class MessageCollection(ModelCollection):
 
 class IDCollection(list):
 	@classmethod
-	def from_json(cls, data):
+	def from_json(cls, data, options = None):
 		self = cls(data)
 		return self
 	
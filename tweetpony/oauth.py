@@ -0,0 +1,99 @@
+# Copyright 2013-2015 Julian Metzler
+
+"""
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import base64
+import binascii
+import hashlib
+import hmac
+from threading import Lock
+from urllib import quote as _quote
+
+from utils import quote
+
+# Characters that don't need to be encoded
+OAUTH_SAFE = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-._~"
+
+# Parameter names and URLs are mostly the same for every request, so their encoded forms are kept
+QUOTED_NAMES = {}
+QUOTED_URLS = {}
+QUOTED_MAX_SIZE = 1024
+
+def oauth_quote(value):
+	# Percent-encodes a value as required by OAuth, like quote(value, safe = "~")
+	if type(value) is str:
+		if not value.rstrip(OAUTH_SAFE):
+			return value
+		return _quote(value, "~")
+	return quote(value, safe = "~")
+
+def oauth_quote_cached(value, cache):
+	quoted = cache.get(value)
+	if quoted is None:
+		quoted = oauth_quote(value)
+		if len(cache) < QUOTED_MAX_SIZE:
+			cache[value] = quoted
+	return quoted
+
+def get_param_string(params):
+	# Parameters are ordered by their upper-case name, then by name and value
+	data = []
+	for name, value in params:
+		name = QUOTED_NAMES.get(name) or oauth_quote_cached(name, QUOTED_NAMES)
+		# Most values don't need to be encoded, so check this without a function call
+		if type(value) is not str or value.rstrip(OAUTH_SAFE):
+			value = oauth_quote(value)
+		data.append((name.upper(), name, value))
+	data.sort()
+	return "&".join([item[1] + "=" + item[2] for item in data])
+
+def quote_param_string(param_string):
+	# The names and values are already encoded, so only these characters are left to encode
+	return param_string.replace("%", "%25").replace("=", "%3D").replace("&", "%26")
+
+class OAuthSigner(object):
+	# Computes HMAC-SHA1 signatures with the signing key of one consumer and token secret, which is only encoded once
+	def __init__(self, consumer_secret, token_secret = None):
+		self.secrets = (consumer_secret, token_secret)
+		self.key = "&".join([oauth_quote(consumer_secret), oauth_quote(token_secret) if token_secret is not None else ""])
+		self.hmac = hmac.new(self.key.encode('utf-8'), digestmod = hashlib.sha1)
+	
+	def __repr__(self):
+		return "<OAuthSigner>"
+	
+	def get_signature_base(self, method, url, params):
+		return "&".join([method.upper(), oauth_quote_cached(url, QUOTED_URLS), quote_param_string(get_param_string(params))])
+	
+	def sign(self, method, url, params):
+		# Returns the encoded signature for a request with the given (name, value) parameters
+		signature = self.hmac.copy()
+		signature.update(self.get_signature_base(method, url, params).encode('utf-8'))
+		signature = binascii.b2a_base64(signature.digest())[:-1]
+		if type(signature) is not str:
+			signature = signature.decode('ascii')
+		return oauth_quote(signature)
+
+# Bearer tokens for app-only authentication by consumer key and secret, shared by all API instances
+BEARER_TOKENS = {}
+BEARER_TOKENS_LOCK = Lock()
+
+def get_basic_auth_header(consumer_key, consumer_secret):
+	# The consumer credentials used to obtain and invalidate bearer tokens
+	credentials = "%s:%s" % (oauth_quote(consumer_key), oauth_quote(consumer_secret))
+	credentials = base64.b64encode(credentials.encode('utf-8'))
+	if type(credentials) is not str:
+		credentials = credentials.decode('ascii')
+	return {'Authorization': "Basic %s" % credentials, 'Content-Type': "application/x-www-form-urlencoded;charset=UTF-8"}
@@ -0,0 +1,202 @@
+# Copyright 2013-2015 Julian Metzler
+
+"""
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import sys
+from Queue import Queue, Empty
+import threading
+from threading import Thread
+
+from endpoints import *
+from error import *
+
+def prefetch(iterable, size = 1):
+	# Runs the iterable in a background thread which stays up to size items
+	# (plus the one it's currently working on) ahead of the consumer
+	queue = Queue(maxsize = size)
+	stopped = threading.Event()
+	
+	def fill():
+		try:
+			for item in iterable:
+				queue.put((True, item))
+				if stopped.is_set():
+					return
+			queue.put((False, None))
+		except Exception:
+			queue.put((False, sys.exc_info()))
+	
+	thread = Thread(target = fill)
+	thread.daemon = True
+	thread.start()
+	try:
+		while True:
+			ok, item = queue.get()
+			if not ok:
+				if item is not None:
+					raise item[0], item[1], item[2]
+				return
+			yield item
+	finally:
+		stopped.set()
+		# Let the thread finish if it's waiting for space in the queue
+		while True:
+			try:
+				queue.get_nowait()
+			except Empty:
+				break
+
+class Cursor(object):
+	def __init__(self, api, endpoint, limit = None, max_pages = None, prefetch = True, **kwargs):
+		if not isinstance(endpoint, Endpoint):
+			endpoint = get_endpoint(endpoint)
+		if 'cursor' not in endpoint.params:
+			raise ParameterError("The %s endpoint doesn't support cursors" % endpoint.name)
+		self.api = api
+		self.endpoint = endpoint
+		self.limit = limit
+		self.max_pages = max_pages
+		self.prefetch = prefetch
+		# This is the cursor of the page after the last one that has been returned; 0 means there are no more pages
+		self.next_cursor = kwargs.pop('cursor', -1)
+		self.kwargs = kwargs
+	
+	def fetch(self, cursor):
+		return self.api.api_call(self.endpoint, cursor = cursor, **self.kwargs)
+	
+	def fetch_pages(self):
+		cursor = self.next_cursor
+		count = 0
+		while cursor and (self.max_pages is None or count < self.max_pages):
+			page = self.fetch(cursor)
+			count += 1
+			cursor = page.get('next_cursor', 0)
+			yield (page, cursor)
+	
+	def pages(self):
+		if self.prefetch:
+			# True means one page ahead, a number that many pages
+			source = prefetch(self.fetch_pages(), size = int(self.prefetch))
+		else:
+			source = self.fetch_pages()
+		try:
+			for page, cursor in source:
+				self.next_cursor = cursor
+				yield page
+		finally:
+			if self.prefetch:
+				source.close()
+	
+	def __iter__(self):
+		if self.limit is not None and self.limit <= 0:
+			return
+		count = 0
+		for page in self.pages():
+			for item in page:
+				yield item
+				count += 1
+				if self.limit is not None and count >= self.limit:
+					return
+
+# Maximum page sizes of the timeline endpoints
+TIMELINE_PAGE_SIZES = {
+	'user_timeline': 200,
+	'home_timeline': 200,
+	'mentions': 200,
+	'retweets_of_me': 100,
+	'list_timeline': 200,
+	'favorites': 200,
+	'search_tweets': 100,
+	'received_messages': 200,
+	'sent_messages': 200,
+}
+
+class Timeline(object):
+	# Walks a timeline backwards from max_id (or the newest item) to since_id, min_date or limit
+	def __init__(self, api, endpoint, limit = None, min_date = None, since_id = None, max_id = None, prefetch = False, **kwargs):
+		if not isinstance(endpoint, Endpoint):
+			endpoint = get_endpoint(endpoint)
+		if 'max_id' not in endpoint.params:
+			raise ParameterError("The %s endpoint doesn't support max_id paging" % endpoint.name)
+		if 'count' in endpoint.params and 'count' not in kwargs and endpoint.name in TIMELINE_PAGE_SIZES:
+			kwargs['count'] = TIMELINE_PAGE_SIZES[endpoint.name]
+		self.api = api
+		self.endpoint = endpoint
+		self.limit = limit
+		self.min_date = min_date
+		self.since_id = since_id
+		self.prefetch = prefetch
+		self.kwargs = kwargs
+		# max_id is the ID to continue at after the last item that has been returned,
+		# newest_id the highest ID returned so far, which can be used as since_id in the next run
+		self.max_id = max_id
+		self.newest_id = since_id
+	
+	def fetch(self, max_id):
+		params = dict(self.kwargs)
+		if max_id is not None:
+			params['max_id'] = max_id
+		if self.since_id is not None:
+			params['since_id'] = self.since_id
+		return self.api.api_call(self.endpoint, **params)
+	
+	def fetch_pages(self):
+		max_id = self.max_id
+		previous_ids = set()
+		count = 0
+		while True:
+			page = self.fetch(max_id)
+			# max_id is inclusive, so don't return items twice if it isn't lowered far enough
+			items = [item for item in page if item.id not in previous_ids]
+			if not items:
+				return
+			previous_ids = set([item.id for item in page])
+			max_id = min(previous_ids) - 1
+			done = False
+			if self.min_date is not None and items[-1].created_at < self.min_date:
+				items = [item for item in items if item.created_at >= self.min_date]
+				done = True
+			if self.limit is not None and count + len(items) >= self.limit:
+				items = items[:self.limit - count]
+				done = True
+			count += len(items)
+			if items:
+				yield items
+			if done:
+				return
+	
+	def pages(self):
+		if self.limit is not None and self.limit <= 0:
+			return
+		if self.prefetch:
+			source = prefetch(self.fetch_pages(), size = int(self.prefetch))
+		else:
+			source = self.fetch_pages()
+		try:
+			for items in source:
+				self.max_id = items[-1].id - 1
+				if self.newest_id is None or items[0].id > self.newest_id:
+					self.newest_id = items[0].id
+				yield items
+		finally:
+			if self.prefetch:
+				source.close()
+	
+	def __iter__(self):
+		for items in self.pages():
+			for item in items:
+				yield item
+				self.max_id = item.id - 1
@@ -0,0 +1,121 @@
+# Copyright 2013-2015 Julian Metzler
+
+"""
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import time
+
+from endpoints import *
+
+# Seconds to wait in addition to the reset time, since our clock may differ from Twitter's
+RATE_LIMIT_MARGIN = 1
+
+class RateLimit(object):
+	def __init__(self, limit, remaining, reset):
+		self.limit = limit
+		self.remaining = remaining
+		# The time at which the current window ends, as a UNIX timestamp
+		self.reset = reset
+	
+	def __repr__(self):
+		return "<RateLimit %i/%i, reset in %is>" % (self.remaining, self.limit, self.reset_in)
+	
+	@property
+	def reset_in(self):
+		return max(self.reset - time.time(), 0)
+	
+	@property
+	def available(self):
+		# The number of calls that can be made right now, taking into account that the window may have ended
+		if self.reset <= time.time():
+			return self.limit
+		return self.remaining
+	
+	@property
+	def exhausted(self):
+		return self.available <= 0
+
+def parse_rate_limit_headers(headers):
+	try:
+		return RateLimit(int(headers['x-rate-limit-limit']), int(headers['x-rate-limit-remaining']), int(headers['x-rate-limit-reset']))
+	except (KeyError, TypeError, ValueError):
+		return None
+
+class RateLimitTable(object):
+	# Keeps the latest rate limit information for every resource, like /statuses/show/:id
+	def __init__(self):
+		self.limits = {}
+	
+	def __repr__(self):
+		return "<RateLimitTable %r>" % self.limits
+	
+	def get_resource(self, resource):
+		# Resources can be given as Endpoint instances, endpoint names or resource names
+		if isinstance(resource, Endpoint):
+			return resource.resource
+		if not resource.startswith("/"):
+			return get_endpoint(resource).resource
+		return resource
+	
+	def update(self, resource, headers):
+		rate_limit = parse_rate_limit_headers(headers)
+		if rate_limit is not None:
+			resource = self.get_resource(resource)
+			current = self.limits.get(resource)
+			# The responses of concurrent calls may arrive out of order, so don't count a call as not made
+			if current is None or current.reset != rate_limit.reset or rate_limit.remaining < current.remaining:
+				self.limits[resource] = rate_limit
+		return rate_limit
+	
+	def load(self, status):
+		# Loads the response of the rate_limit_status endpoint
+		for family, resources in status['resources'].iteritems():
+			for resource, data in resources.iteritems():
+				self.limits[resource] = RateLimit(data['limit'], data['remaining'], data['reset'])
+	
+	def get(self, resource, default = None):
+		return self.limits.get(self.get_resource(resource), default)
+	
+	def __getitem__(self, resource):
+		return self.limits[self.get_resource(resource)]
+	
+	def __contains__(self, resource):
+		return self.get_resource(resource) in self.limits
+	
+	def __iter__(self):
+		return iter(self.limits)
+	
+	def __len__(self):
+		return len(self.limits)
+	
+	def items(self):
+		return self.limits.items()
+	
+	def family(self, family):
+		prefix = "/%s/" % family
+		return dict([(resource, rate_limit) for resource, rate_limit in self.limits.items() if resource.startswith(prefix)])
+	
+	def wait_time(self, resource):
+		# Returns the number of seconds to wait until the resource can be used again
+		rate_limit = self.get(resource)
+		if rate_limit is None or not rate_limit.exhausted:
+			return 0
+		return rate_limit.reset_in + RATE_LIMIT_MARGIN
+	
+	def wait(self, resource):
+		seconds = self.wait_time(resource)
+		if seconds:
+			time.sleep(seconds)
+		return seconds
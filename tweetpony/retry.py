@@ -0,0 +1,83 @@
+# Copyright 2013-2015 Julian Metzler
+
+"""
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import random
+import time
+
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+class RetryPolicy(object):
+	# max_attempts includes the first attempt. The n-th retry waits for a random time
+	# between 0 and backoff * 2 ** (n - 1) seconds (at most max_backoff), unless Twitter
+	# tells us how long to wait, which is respected if it's not longer than max_wait
+	def __init__(self, max_attempts = 4, backoff = 1.0, max_backoff = 60.0, max_wait = 900.0, jitter = True, statuses = RETRY_STATUSES, methods = ("GET", ), connection_errors = True):
+		self.max_attempts = max_attempts
+		self.backoff = backoff
+		self.max_backoff = max_backoff
+		self.max_wait = max_wait
+		self.jitter = jitter
+		self.statuses = frozenset(statuses)
+		self.methods = frozenset([method.upper() for method in methods])
+		self.connection_errors = connection_errors
+	
+	def __repr__(self):
+		return "<RetryPolicy %i attempts, methods %s>" % (self.max_attempts, ", ".join(sorted(self.methods)))
+	
+	def get_backoff(self, attempt):
+		delay = min(self.backoff * 2 ** (attempt - 1), self.max_backoff)
+		if self.jitter:
+			# Spread the retries of many clients failing at the same time
+			delay = random.uniform(0, delay)
+		return delay
+	
+	def get_server_delay(self, status_code, headers):
+		# Returns the delay requested by Twitter, if any
+		if not headers:
+			return None
+		retry_after = headers.get('retry-after')
+		if retry_after:
+			try:
+				return max(float(retry_after), 0)
+			except ValueError:
+				pass
+		reset = headers.get('x-rate-limit-reset')
+		if status_code == 429 and reset:
+			try:
+				return max(int(reset) - time.time(), 0)
+			except ValueError:
+				pass
+		return None
+	
+	def get_delay(self, method, attempt, status_code = None, headers = None):
+		# Returns the number of seconds to wait before the next attempt or None if the request shouldn't be retried.
+		# attempt is the number of the failed attempt, status_code is None for connection errors.
+		if attempt >= self.max_attempts or method.upper() not in self.methods:
+			return None
+		if status_code is None:
+			if not self.connection_errors:
+				return None
+			return self.get_backoff(attempt)
+		if status_code not in self.statuses:
+			return None
+		delay = self.get_server_delay(status_code, headers)
+		if delay is None:
+			return self.get_backoff(attempt)
+		if delay > self.max_wait:
+			return None
+		if self.jitter:
+			delay += random.uniform(0, self.backoff)
+		return delay
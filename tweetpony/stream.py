@@ -0,0 +1,314 @@
+# Copyright 2013-2015 Julian Metzler
+
+"""
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import json
+import signal
+import sys
+import threading
+from threading import Thread
+
+from models import *
+
+STREAM_CHUNK_SIZE = 16384
+# The number of messages sent to a parse process at once; batches are smaller when fewer messages are waiting
+PARSE_BATCH_SIZE = 100
+# Twitter sends a keep-alive newline every 30 seconds, so a stream that has been silent for longer is considered stalled
+STREAM_STALL_TIMEOUT = 90
+
+# Reconnection delays recommended by Twitter, in seconds
+NETWORK_ERROR_BACKOFF = 0.25
+NETWORK_ERROR_MAX_BACKOFF = 16
+HTTP_ERROR_BACKOFF = 5
+HTTP_ERROR_MAX_BACKOFF = 320
+RATE_LIMIT_BACKOFF = 60
+RATE_LIMIT_MAX_BACKOFF = 960
+
+class LineFramer(object):
+	# Splits the stream on CRLF, skipping the keep-alive newlines
+	def __init__(self):
+		self.buffer = bytearray()
+		self.scanned = 0
+	
+	def feed(self, data):
+		buf = self.buffer
+		buf.extend(data)
+		messages = []
+		start = 0
+		# Don't scan the part of an incomplete message we've already looked at again
+		end = buf.find(b"\r\n", max(self.scanned - 1, 0))
+		if end == -1:
+			self.scanned = len(buf)
+			return messages
+		view = memoryview(buf)
+		while end != -1:
+			if end > start:
+				messages.append(view[start:end].tobytes())
+			start = end + 2
+			end = buf.find(b"\r\n", start)
+		# The buffer can't be resized while a memoryview of it exists
+		del view
+		del buf[:start]
+		self.scanned = len(buf)
+		return messages
+
+class LengthFramer(object):
+	# Handles delimited=length streams, where every message is preceded by a line containing its length in bytes
+	def __init__(self):
+		self.buffer = bytearray()
+		self.length = None
+	
+	def feed(self, data):
+		buf = self.buffer
+		buf.extend(data)
+		messages = []
+		start = 0
+		size = len(buf)
+		view = memoryview(buf)
+		while True:
+			if self.length is None:
+				end = buf.find(b"\r\n", start)
+				if end == -1:
+					break
+				line = view[start:end].tobytes().strip()
+				start = end + 2
+				if line:
+					self.length = int(line)
+			else:
+				if size - start < self.length:
+					break
+				end = start + self.length
+				# The length includes the CRLF terminating the message
+				if view[end - 2:end].tobytes() == b"\r\n":
+					messages.append(view[start:end - 2].tobytes())
+				else:
+					messages.append(view[start:end].tobytes())
+				start = end
+				self.length = None
+		del view
+		del buf[:start]
+		return messages
+
+def get_framer(delimited = None):
+	if delimited == 'length':
+		return LengthFramer()
+	return LineFramer()
+
+def iter_messages(response, delimited = None, chunk_size = STREAM_CHUNK_SIZE):
+	# The streaming API uses chunked transfer encoding, so iter_content yields every chunk
+	# as soon as it has arrived instead of waiting for chunk_size bytes
+	framer = get_framer(delimited)
+	for chunk in response.iter_content(chunk_size = chunk_size):
+		for message in framer.feed(chunk):
+			yield message
+
+class StreamReader(Thread):
+	# Reads and frames the messages of a stream in a thread and hands them out in batches of the messages that have
+	# arrived, so that a slow stream doesn't wait for a full batch. At most max_batches batches are handed out and not
+	# finished at a time, so a slow processor slows down reading like it does without a reader thread.
+	def __init__(self, response, delimited = None, batch_size = PARSE_BATCH_SIZE, max_batches = 2):
+		Thread.__init__(self)
+		self.daemon = True
+		self.response = response
+		self.delimited = delimited
+		self.batch_size = batch_size
+		self.max_batches = max_batches
+		self.condition = threading.Condition()
+		self.messages = []
+		self.unfinished = 0
+		self.done = False
+		self.stopped = False
+		self.exc_info = None
+	
+	def run(self):
+		framer = get_framer(self.delimited)
+		condition = self.condition
+		try:
+			for chunk in self.response.iter_content(chunk_size = STREAM_CHUNK_SIZE):
+				messages = framer.feed(chunk)
+				if not messages:
+					continue
+				with condition:
+					while len(self.messages) >= self.batch_size and not self.stopped:
+						condition.wait()
+					if self.stopped:
+						return
+					self.messages.extend(messages)
+					condition.notify_all()
+		except:
+			# Raised again by check after the messages read before the error have been handled
+			self.exc_info = sys.exc_info()
+		with condition:
+			self.done = True
+			condition.notify_all()
+	
+	def batches(self):
+		condition = self.condition
+		while True:
+			with condition:
+				while not self.stopped and (self.unfinished >= self.max_batches or not self.messages and not self.done):
+					condition.wait()
+				if self.stopped or not self.messages:
+					return
+				batch = self.messages[:self.batch_size]
+				del self.messages[:self.batch_size]
+				self.unfinished += 1
+				condition.notify_all()
+			yield batch
+	
+	def finish_batch(self):
+		with self.condition:
+			self.unfinished -= 1
+			self.condition.notify_all()
+	
+	def check(self):
+		if self.exc_info is not None:
+			raise self.exc_info[0], self.exc_info[1], self.exc_info[2]
+	
+	def stop(self):
+		with self.condition:
+			self.stopped = True
+			self.condition.notify_all()
+
+# The registry, model options and json_in_models setting of the stream a parse process works for
+PARSE_STATE = {}
+
+def init_parse_process(entities, options, json_in_models):
+	# Interrupting the stream is handled by the main process, which terminates the pool
+	signal.signal(signal.SIGINT, signal.SIG_IGN)
+	PARSE_STATE['entities'] = entities
+	PARSE_STATE['options'] = options
+	PARSE_STATE['json_in_models'] = json_in_models
+
+def parse_stream_batch(messages):
+	# Runs in the parse processes, which send the entities back pickled in one piece
+	entities = PARSE_STATE['entities']
+	options = PARSE_STATE['options']
+	json_in_models = PARSE_STATE['json_in_models']
+	results = []
+	for message in messages:
+		try:
+			data = json.loads(message)
+		except ValueError:
+			continue
+		entity = entities.parse(data, options)
+		if entity is None:
+			continue
+		if json_in_models:
+			attach_json(entity, message, None)
+		results.append(entity)
+	return results
+
+class StreamBackoff(object):
+	# Network errors back off linearly, HTTP errors and rate limiting (420) exponentially
+	def __init__(self):
+		self.reset()
+	
+	def reset(self):
+		# Called after a connection has been established successfully
+		self.network_delay = 0
+		self.http_delay = 0
+		self.rate_limit_delay = 0
+	
+	def is_fatal(self, status):
+		# Client errors like 401 or 406 won't go away by reconnecting
+		return status is not None and 400 <= status < 500 and status not in (420, 429)
+	
+	def get_delay(self, status = None):
+		# status is the HTTP status code the connection failed with or None for network errors
+		if status is None:
+			self.network_delay = min(self.network_delay + NETWORK_ERROR_BACKOFF, NETWORK_ERROR_MAX_BACKOFF)
+			return self.network_delay
+		if status in (420, 429):
+			self.rate_limit_delay = min(self.rate_limit_delay * 2 or RATE_LIMIT_BACKOFF, RATE_LIMIT_MAX_BACKOFF)
+			return self.rate_limit_delay
+		self.http_delay = min(self.http_delay * 2 or HTTP_ERROR_BACKOFF, HTTP_ERROR_MAX_BACKOFF)
+		return self.http_delay
+
+class StreamEntityRegistry(object):
+	def __init__(self, default = None, default_handler = None):
+		# Messages like {"delete": {...}} are recognised by their only key and their payload is parsed
+		self.envelopes = {}
+		# Messages like events are recognised by a key among many others and are parsed as a whole
+		self.markers = []
+		# Messages like {"for_user": 123, "message": {...}} wrap another message, which is parsed on its own
+		self.payloads = {}
+		# Handlers are looked up by the key a message was recognised by, which parse stores in the entity;
+		# messages of the default kind have the key None
+		self.handlers = {None: default_handler}
+		self.default = default
+	
+	def register(self, key, model, handler, unwrap = True, payload = None):
+		self.unregister(key)
+		if payload is not None:
+			self.payloads[key] = payload
+			unwrap = False
+		if unwrap:
+			self.envelopes[key] = model
+		else:
+			self.markers.append((key, model))
+		self.handlers[key] = handler
+	
+	def unregister(self, key):
+		self.envelopes.pop(key, None)
+		self.markers = [(k, m) for k, m in self.markers if k != key]
+		self.payloads.pop(key, None)
+		self.handlers.pop(key, None)
+	
+	def classify(self, data):
+		# Returns the key the message was recognised by, its model and the data to build it from
+		if len(data) == 1:
+			for key in data:
+				model = self.envelopes.get(key)
+				if model is not None:
+					return (key, model, data[key])
+		for key, model in self.markers:
+			if key in data:
+				return (key, model, data)
+		return (None, self.default, data)
+	
+	def parse(self, data, options = None):
+		key, model, data = self.classify(data)
+		if model is None:
+			return None
+		payload = self.payloads.get(key)
+		if payload is not None and isinstance(data.get(payload), dict):
+			data = dict(data)
+			data[payload] = self.parse(data[payload], options)
+		entity = model.from_json(data, options)
+		if key is not None:
+			entity._stream_key = key
+		return entity
+	
+	def get_handler(self, entity):
+		return self.handlers.get(getattr(entity, '_stream_key', None))
+
+STREAM_ENTITIES = StreamEntityRegistry(default = Status, default_handler = 'on_status')
+STREAM_ENTITIES.register('delete', DeletionEvent, 'on_delete')
+STREAM_ENTITIES.register('scrub_geo', LocationDeletionEvent, 'on_geo_delete')
+STREAM_ENTITIES.register('limit', LimitEvent, 'on_limit')
+STREAM_ENTITIES.register('status_withheld', WithheldStatusEvent, 'on_withheld_status')
+STREAM_ENTITIES.register('user_withheld', WithheldUserEvent, 'on_withheld_user')
+STREAM_ENTITIES.register('disconnect', DisconnectEvent, 'on_disconnect')
+STREAM_ENTITIES.register('warning', WarningEvent, 'on_warning')
+STREAM_ENTITIES.register('friends', IDCollection, 'on_friends')
+STREAM_ENTITIES.register('friends_str', IDCollection, 'on_friends')
+STREAM_ENTITIES.register('direct_message', Message, 'on_message')
+STREAM_ENTITIES.register('target', Event, 'on_event', unwrap = False)
+STREAM_ENTITIES.register('for_user', Model, 'on_for_user', payload = 'message')
+
+def register_stream_entity(key, model, handler, unwrap = True, payload = None):
+	STREAM_ENTITIES.register(key, model, handler, unwrap, payload)